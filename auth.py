@@ -9,6 +9,10 @@ from telethon.errors import (
     AuthKeyError
 )
 from dotenv import load_dotenv
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+from utils.flood_limiter import FloodWaitLimiter, SessionCooldown
+import asyncio
 import os
 import logging
 
@@ -16,14 +20,23 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Фабрика клиента: (session_name, api_id, api_hash) -> объект с интерфейсом TelegramClient
+ClientFactory = Callable[[str, Optional[str], Optional[str]], object]
+
 class AuthManager:
-    def __init__(self, session_name="UniCrawler"):
+    def __init__(self, session_name="UniCrawler", client_factory: Optional[ClientFactory] = None):
         self.api_id = os.getenv("API_ID")
         self.api_hash = os.getenv("API_HASH")
-        self.phone_number = os.getenv("PHONE_NUMBER")
+        # Для дополнительных аккаунтов пула можно задать PHONE_NUMBER_<SESSION>
+        self.phone_number = (os.getenv(f"PHONE_NUMBER_{session_name.upper()}")
+                             or os.getenv("PHONE_NUMBER"))
         self.session_name = session_name
-        self.client = TelegramClient(self.session_name, self.api_id, self.api_hash)
-        self._validate_credentials()
+        self.client_factory = client_factory
+        # Клиент создается при подключении: конструктор открывает файл сессии
+        self.client = None
+        # Учетные данные нужны только настоящему клиенту (не тестовому бэкенду)
+        if client_factory is None:
+            self._validate_credentials()
 
     def _validate_credentials(self):
         missing = []
@@ -41,6 +54,14 @@ class AuthManager:
 
     async def start(self):
         try:
+            if self.client is None:
+                if self.client_factory:
+                    self.client = self.client_factory(self.session_name, self.api_id, self.api_hash)
+                else:
+                    # Telethon по умолчанию сам ждет FloodWait до 60 секунд внутри запроса:
+                    # порог 0 передает каждый FloodWait в SessionPool для переключения сессии и учета
+                    self.client = TelegramClient(self.session_name, self.api_id, self.api_hash,
+                                                 flood_sleep_threshold=0)
             await self.client.connect()
             if not await self.client.is_user_authorized():
                 await self._perform_initial_auth()
@@ -105,8 +126,100 @@ class AuthManager:
 
     async def disconnect(self):
         try:
-            if self.client.is_connected():
+            if self.client and self.client.is_connected():
                 await self.client.disconnect()
                 logger.info("Сессия успешно завершена")
         except Exception as e:
             logger.error(f"Ошибка при завершении сессии: {e}")
+
+
+class PooledSession:
+    def __init__(self, name: str, client, limiter: FloodWaitLimiter):
+        self.name = name
+        self.client = client
+        self.limiter = limiter
+
+class SessionPool:
+    def __init__(self, session_names: Optional[List[str]] = None, concurrency: int = 4,
+                 interval: float = 0.0, max_retries: int = 5,
+                 client_factory: Optional[ClientFactory] = None):
+        if not session_names:
+            session_names = [name.strip() for name in
+                             os.getenv("TELEGRAM_SESSIONS", "UniCrawler").split(",") if name.strip()]
+        if len(set(session_names)) != len(session_names):
+            raise ValueError("Имена сессий в пуле должны быть уникальными")
+        self.managers = [AuthManager(name, client_factory=client_factory) for name in session_names]
+        self.concurrency = concurrency
+        self.interval = interval
+        self.max_retries = max_retries
+        self.sessions: List[PooledSession] = []
+        # Учет FloodWait по сессиям и методам: количество и суммарное время штрафа
+        self.flood_stats: Dict[str, Dict[str, Dict[str, int]]] = defaultdict(
+            lambda: defaultdict(lambda: {"count": 0, "seconds": 0})
+        )
+
+    async def start(self) -> List[PooledSession]:
+        # Авторизация последовательная: при первичном входе код вводится вручную
+        for manager in self.managers:
+            try:
+                client = await manager.start()
+                limiter = FloodWaitLimiter(concurrency=self.concurrency, interval=self.interval)
+                self.sessions.append(PooledSession(manager.session_name, client, limiter))
+                logger.info(f"Сессия {manager.session_name} подключена")
+            except Exception as e:
+                logger.error(f"Не удалось подключить сессию {manager.session_name}: {str(e)}")
+
+        if not self.sessions:
+            raise ValueError("Нет ни одной авторизованной сессии Telegram")
+        return self.sessions
+
+    def record_flood_wait(self, session: PooledSession, method: str, seconds: int):
+        entry = self.flood_stats[session.name][method]
+        entry["count"] += 1
+        entry["seconds"] += seconds
+
+    def _pick(self, candidates: List[PooledSession], method: str) -> PooledSession:
+        # Сессия, которая освободится раньше всех; при равенстве - наименее загруженная
+        return min(candidates, key=lambda s: (s.limiter.cooldown_for(method), s.limiter.in_flight))
+
+    async def request(self, request_cls, peers: Optional[Dict[str, object]] = None, **kwargs):
+        _, result = await self.request_with_session(request_cls, peers=peers, **kwargs)
+        return result
+
+    async def request_with_session(self, request_cls, peers: Optional[Dict[str, object]] = None,
+                                   **kwargs):
+        # Возвращает и сессию, выполнившую запрос: access_hash в ответе действителен только для нее
+        method = request_cls.__name__
+        candidates = [s for s in self.sessions if peers is None or s.name in peers]
+        if not candidates:
+            raise ValueError(f"Нет сессий с доступом к объекту для {method}")
+
+        attempt = 0
+        while True:
+            session = self._pick(candidates, method)
+            # Все подходящие сессии на паузе: ожидание без занятого слота до ближайшей освободившейся
+            await session.limiter.wait_cooldown(method)
+            request_kwargs = dict(kwargs)
+            if peers is not None:
+                request_kwargs["peer"] = peers[session.name]
+            try:
+                result = await session.limiter.attempt(method, session.client, request_cls(**request_kwargs))
+                return session, result
+            except SessionCooldown:
+                # Сессия получила FloodWait, пока запрос ждал слота: выбор сессии заново
+                continue
+            except FloodWaitError as e:
+                attempt += 1
+                self.record_flood_wait(session, method, e.seconds)
+                if attempt > self.max_retries:
+                    logger.error(f"Превышено количество повторов {method} после FloodWait")
+                    raise
+                logger.warning(f"FloodWait {e.seconds} c для {method} в сессии {session.name}, "
+                               f"запрос передан другой сессии")
+
+    def flood_report(self) -> Dict[str, Dict[str, Dict[str, int]]]:
+        return {name: dict(methods) for name, methods in self.flood_stats.items()}
+
+    async def disconnect(self):
+        await asyncio.gather(*(manager.disconnect() for manager in self.managers),
+                             return_exceptions=True)
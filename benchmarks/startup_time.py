@@ -0,0 +1,73 @@
+# benchmarks/startup_time.py
+# Замер времени импорта в стиле `python -X importtime` для каждой подкоманды.
+# Завершается с кодом 1, если запрещенный тяжелый модуль попал в импорт
+# или суммарное время превысило бюджет.
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Что импортирует каждая подкоманда до начала работы и какие модули ей не нужны
+SCENARIOS = {
+    "main": ("import main", ("telethon", "pandas", "matplotlib", "numpy", "scipy", "aiohttp", "bs4")),
+    "web1": ("import main; from crawlers.web1_crawler import Web1Crawler",
+             ("telethon", "pandas", "matplotlib", "numpy", "scipy")),
+    "web2": ("import main; from crawlers.web2_telegram_crawler import TelegramCrawler",
+             ("matplotlib", "scipy", "bs4")),
+}
+
+def measure(code: str):
+    # Каждый замер в новом интерпретаторе, чтобы кеш sys.modules не искажал результат
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, raw_name = line[len("import time:"):].split("|")
+        # Вложенность импорта обозначается отступом имени модуля
+        depth = len(raw_name) - len(raw_name.lstrip())
+        modules[raw_name.strip()] = (int(self_us), int(cumulative_us), depth)
+    total_us = sum(self_us for self_us, _, _ in modules.values())
+    return total_us, modules
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер времени запуска подкоманд main.py")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="Максимальное суммарное время импорта для каждого сценария")
+    parser.add_argument("--top", type=int, default=5, help="Сколько самых медленных модулей показать")
+    parser.add_argument("--repeat", type=int, default=3, help="Количество замеров (берется минимум)")
+    args = parser.parse_args()
+
+    failed = False
+    for scenario, (code, forbidden) in SCENARIOS.items():
+        runs = [measure(code) for _ in range(args.repeat)]
+        total_us, modules = min(runs, key=lambda run: run[0])
+
+        print(f"\n=== {scenario}: {total_us / 1000:.1f} мс, модулей: {len(modules)} ===")
+        min_depth = min((depth for _, _, depth in modules.values()), default=0)
+        top_level = sorted(((cumulative, name) for name, (_, cumulative, depth) in modules.items()
+                            if depth == min_depth), reverse=True)
+        for cumulative, name in top_level[:args.top]:
+            print(f"  {cumulative / 1000:8.1f} мс  {name}")
+
+        leaked = sorted({name for name in modules if name.split(".")[0] in forbidden})
+        if leaked:
+            roots = sorted({name.split(".")[0] for name in leaked})
+            print(f"  ОШИБКА: импортированы лишние зависимости: {', '.join(roots)}")
+            failed = True
+        if args.budget_ms is not None and total_us / 1000 > args.budget_ms:
+            print(f"  ОШИБКА: превышен бюджет {args.budget_ms} мс")
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# benchmarks/telegram_throughput.py
+# Замер пропускной способности web2 на локальной имитации Telegram API:
+# сообщений в секунду, запросов к API на сообщение и потребление памяти.
+# Все файлы краулера пишутся во временную папку, которая удаляется после замера.
+import argparse
+import asyncio
+import logging
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def run(args) -> dict:
+    from crawlers.web2_telegram_crawler import SEARCH_KEYWORDS, TelegramCrawler
+    from utils.fake_telegram import FakeTelegramBackend
+
+    channels_per_label = max(1, args.channels // len(SEARCH_KEYWORDS))
+    messages_per_channel = max(1, args.messages // (channels_per_label * len(SEARCH_KEYWORDS)))
+    backend = FakeTelegramBackend(
+        list(SEARCH_KEYWORDS),
+        channels_per_label=channels_per_label,
+        messages_per_channel=messages_per_channel,
+        latency=args.latency,
+        flood_rate=args.flood_rate,
+        flood_seconds=args.flood_seconds
+    )
+    crawler = TelegramCrawler(
+        max_messages=messages_per_channel,
+        delay=args.delay,
+        concurrency=args.concurrency,
+        days=30,
+        output_format=args.output_format,
+        sessions=[f"bench{number}" for number in range(1, args.sessions + 1)],
+        discovery=args.discovery,
+        client_factory=backend.client_factory
+    )
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    started = time.perf_counter()
+    asyncio.run(crawler.crawl())
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+    if args.tracemalloc:
+        tracemalloc.stop()
+
+    # ru_maxrss в Linux указывается в КБ
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    processed = crawler.aggregates.total.posts
+    api_calls = sum(backend.calls.values())
+    return {
+        "expected": backend.total_messages,
+        "processed": processed,
+        "channels": len(backend.channels),
+        "elapsed": elapsed,
+        "messages_per_sec": processed / elapsed if elapsed else 0,
+        "api_calls": api_calls,
+        "calls_by_method": dict(backend.calls),
+        "flood_waits": dict(backend.flood_waits),
+        "calls_per_message": api_calls / processed if processed else 0,
+        "max_rss": max_rss,
+        "tracemalloc_peak": peak
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Пропускная способность web2 на имитации Telegram API")
+    parser.add_argument("--messages", type=int, default=1_000_000, help="Общее количество сообщений")
+    parser.add_argument("--channels", type=int, default=200, help="Количество каналов")
+    parser.add_argument("--sessions", type=int, default=2, help="Количество сессий в пуле")
+    parser.add_argument("--concurrency", type=int, default=4, help="Параллельных запросов на сессию")
+    parser.add_argument("--delay", type=float, default=0.0, help="Интервал между запросами сессии")
+    parser.add_argument("--latency", type=float, default=0.0, help="Задержка ответа API в секундах")
+    parser.add_argument("--flood-rate", type=float, default=0.0, help="Вероятность FloodWait на запрос")
+    parser.add_argument("--flood-seconds", type=int, default=1, help="Длительность FloodWait")
+    parser.add_argument("--discovery", choices=["search", "dialogs", "both"], default="search",
+                        help="Режим поиска каналов")
+    parser.add_argument("--output-format", choices=["csv", "parquet"], default="csv",
+                        help="Формат сохранения публикаций")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="Пиковая память Python через tracemalloc (замедляет работу)")
+    parser.add_argument("--keep-files", action="store_true",
+                        help="Не удалять временную папку с результатами краулера")
+    parser.add_argument("--min-rate", type=float, default=None,
+                        help="Минимально допустимое количество сообщений в секунду")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, force=True)
+    workdir = tempfile.mkdtemp(prefix="telegram_bench_")
+    os.chdir(workdir)
+    try:
+        result = run(args)
+    finally:
+        os.chdir(ROOT)
+        if not args.keep_files:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n=== web2: {result['processed']} из {result['expected']} сообщений, "
+          f"каналов: {result['channels']} ===")
+    print(f"  Время:                  {result['elapsed']:.1f} с")
+    print(f"  Сообщений в секунду:    {result['messages_per_sec']:.0f}")
+    print(f"  Запросов к API:         {result['api_calls']} {result['calls_by_method']}")
+    print(f"  Запросов на сообщение:  {result['calls_per_message']:.4f}")
+    if result['flood_waits']:
+        print(f"  FloodWait:              {result['flood_waits']}")
+    print(f"  Максимальный RSS:       {result['max_rss'] / 1024 / 1024:.0f} МБ")
+    if result['tracemalloc_peak'] is not None:
+        print(f"  Пик tracemalloc:        {result['tracemalloc_peak'] / 1024 / 1024:.0f} МБ")
+    if args.keep_files:
+        print(f"  Рабочая папка:          {workdir}")
+
+    failed = result['processed'] != result['expected']
+    if failed:
+        print("  ОШИБКА: обработаны не все сообщения")
+    if args.min_rate is not None and result['messages_per_sec'] < args.min_rate:
+        print(f"  ОШИБКА: меньше {args.min_rate} сообщений в секунду")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+# crawlers/document_pipeline.py
+import aiohttp
+import asyncio
+import hashlib
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional
+from parsers.parser_document import extract_document_text
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+# Файла точно нет: повторять запрос через GET бессмысленно. На остальные ошибки HEAD
+# (405, 501, 403 у части серверов) документ проверяется потоковым GET
+MISSING_STATUSES = (404, 410)
+
+class DocumentPipeline:
+    def __init__(self, session: aiohttp.ClientSession, sink: Callable[[str, str], None],
+                 can_fetch: Optional[Callable[[str], Awaitable[bool]]] = None,
+                 output_dir: str = "data/documents", concurrency: int = 2,
+                 max_file_size: int = 20 * 1024 * 1024, max_total_bytes: int = 500 * 1024 * 1024,
+                 head_batch_size: int = 20, process_workers: Optional[int] = None):
+        if concurrency < 1:
+            raise ValueError("Количество параллельных загрузок документов должно быть >= 1")
+        if max_file_size <= 0 or max_total_bytes <= 0:
+            raise ValueError("Лимиты размера документов должны быть > 0")
+        self.session = session
+        self.sink = sink
+        self.can_fetch = can_fetch
+        self.output_dir = output_dir
+        self.max_file_size = max_file_size
+        self.max_total_bytes = max_total_bytes
+        self.head_batch_size = head_batch_size
+        self.process_workers = process_workers
+        # Собственный семафор: загрузка документов не занимает слоты обхода страниц
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.queue = asyncio.Queue()
+        self.seen = set()
+        self.reserved_bytes = 0
+        self.stats = {"queued": 0, "checked": 0, "downloaded": 0, "extracted": 0,
+                      "skipped": 0, "bytes": 0}
+        self._tasks = set()
+        self._head_task = None
+        self._executor = None
+
+    async def start(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._executor = ProcessPoolExecutor(max_workers=self.process_workers)
+        self._head_task = asyncio.create_task(self._head_loop())
+
+    def submit(self, url: str, ext: str):
+        if url in self.seen:
+            return
+        self.seen.add(url)
+        self.stats["queued"] += 1
+        self.queue.put_nowait((url, ext))
+
+    async def _head_loop(self):
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.head_batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            try:
+                # Пакетный HEAD: размер и тип всех файлов пачки узнаются параллельно
+                infos = await asyncio.gather(*(self._head(url, ext) for url, ext in batch))
+                for info in infos:
+                    if info and self._select(info):
+                        task = asyncio.create_task(self._download_and_extract(info))
+                        self._tasks.add(task)
+                        task.add_done_callback(self._tasks.discard)
+            except Exception as e:
+                logger.error(f"Ошибка обработки пачки документов: {str(e)}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def _head(self, url: str, ext: str) -> Optional[Dict[str, Any]]:
+        try:
+            if self.can_fetch and not await self.can_fetch(url):
+                logger.info(f"Загрузка документа запрещена robots.txt: {url}")
+                return None
+            async with self.semaphore:
+                async with self.session.head(url, allow_redirects=True, timeout=10) as response:
+                    self.stats["checked"] += 1
+                    if response.status in MISSING_STATUSES:
+                        logger.warning(f"Документ недоступен ({response.status}): {url}")
+                        return None
+                    if response.status >= 400:
+                        logger.debug(f"HEAD не поддерживается ({response.status}), размер будет проверен "
+                                     f"при загрузке: {url}")
+                        return {"url": url, "ext": ext, "size": None, "content_type": ""}
+                    return {
+                        "url": url,
+                        "ext": ext,
+                        "size": response.content_length,
+                        "content_type": response.headers.get("Content-Type", "")
+                    }
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"Ошибка HEAD-запроса для документа {url}: {str(e)}")
+            return None
+
+    def _select(self, info: Dict[str, Any]) -> bool:
+        size = info["size"]
+        if "text/html" in info["content_type"]:
+            reason = "сервер вернул HTML вместо файла"
+        elif size is not None and size > self.max_file_size:
+            reason = f"размер {size} больше лимита {self.max_file_size}"
+        elif self.reserved_bytes + (size or 0) > self.max_total_bytes:
+            reason = "исчерпан общий лимит объема документов"
+        else:
+            # Известный размер резервируется заранее, неизвестный - по мере получения данных,
+            # чтобы параллельные загрузки не превысили лимит
+            self.reserved_bytes += size or 0
+            return True
+        logger.info(f"Документ пропущен ({reason}): {info['url']}")
+        self.stats["skipped"] += 1
+        return False
+
+    async def _download(self, info: Dict[str, Any]) -> Optional[str]:
+        url = info["url"]
+        name = hashlib.sha1(url.encode("utf-8")).hexdigest()[:20]
+        path = os.path.join(self.output_dir, f"{name}.{info['ext']}")
+        # Объем, зарезервированный под этот файл в общем лимите
+        reserved = info["size"] or 0
+        received = 0
+
+        try:
+            async with self.semaphore:
+                async with self.session.get(url, timeout=aiohttp.ClientTimeout(total=300)) as response:
+                    response.raise_for_status()
+                    if info["size"] is None:
+                        # HEAD не дал размера или не поддерживается: проверки по заголовкам GET
+                        if "text/html" in response.headers.get("Content-Type", ""):
+                            raise ValueError("сервер вернул HTML вместо файла")
+                        if response.content_length and response.content_length > self.max_file_size:
+                            raise ValueError(f"размер {response.content_length} больше лимита {self.max_file_size}")
+                    # Потоковая запись на диск: файл не буферизуется в памяти целиком
+                    with open(path, "wb") as file:
+                        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                            received += len(chunk)
+                            if received > self.max_file_size:
+                                raise ValueError("превышен лимит размера файла")
+                            if received > reserved:
+                                # Резерв растет вместе с полученными данными: проверка и резервирование
+                                # выполняются без await, поэтому параллельные загрузки не обгоняют лимит
+                                grow = received - reserved
+                                if self.reserved_bytes + grow > self.max_total_bytes:
+                                    raise ValueError("исчерпан общий лимит объема документов")
+                                self.reserved_bytes += grow
+                                reserved += grow
+                            file.write(chunk)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            logger.warning(f"Документ {url} не загружен: {str(e)}")
+            self.reserved_bytes -= reserved
+            self.stats["skipped"] += 1
+            if os.path.exists(path):
+                os.remove(path)
+            return None
+
+        # Неиспользованная часть резерва освобождается
+        self.reserved_bytes -= reserved - received
+        self.stats["downloaded"] += 1
+        self.stats["bytes"] += received
+        return path
+
+    async def _download_and_extract(self, info: Dict[str, Any]):
+        path = await self._download(info)
+        if not path:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+            # Разбор PDF/DOC занимает CPU, поэтому выполняется в пуле процессов
+            text = await loop.run_in_executor(self._executor, extract_document_text, path, info["ext"])
+            if text:
+                self.sink(info["url"], text)
+                self.stats["extracted"] += 1
+        except Exception as e:
+            logger.error(f"Ошибка извлечения текста документа {info['url']}: {str(e)}")
+
+    async def close(self):
+        if self._head_task is None:
+            return
+        try:
+            await self.queue.join()
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+        finally:
+            self._head_task.cancel()
+            self._head_task = None
+            self._executor.shutdown(wait=True)
+            logger.info(f"Документы: {self.stats}")
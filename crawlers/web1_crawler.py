@@ -1,18 +1,60 @@
 # crawlers/web1_crawler.py
 import aiohttp
 import asyncio
+import re
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from urllib.parse import urlparse, urljoin, ParseResult
 from parsers.parser_html import WebPageProcessor
-from utils.robots_checker import check_robots_txt_async
+from utils.robots_checker import check_robots_txt_async, get_sitemaps_async
+from utils.sitemap_loader import iter_sitemap_urls
+from utils.link_graph import LinkGraph
+from utils.warc import WarcWriter, select_crawl_files, read_index, iter_records
+from crawlers.document_pipeline import DocumentPipeline
 import logging
 from typing import Optional, Tuple, List, Dict, Any
 
 logger = logging.getLogger(__name__)
 
+FILE_EXTENSIONS = ('pdf', 'doc', 'docx')
+REPLAY_CHUNK_RECORDS = 200
+
+# Результат разбора страницы, который можно передать из процесса-воркера
+ParsedPage = namedtuple("ParsedPage", ["full_text", "links"])
+
+_CHARSET = re.compile(r'charset=["\']?([\w-]+)', re.I)
+
+def _parse_warc_chunk(path: str, entries: list) -> list:
+    # Выполняется в пуле процессов: распаковка и разбор HTML без сети
+    results = []
+    for url, status, headers, body in iter_records(path, entries):
+        content_type = headers.get('content-type', '')
+        page = None
+        if status < 400 and 'text/html' in content_type:
+            match = _CHARSET.search(content_type)
+            try:
+                html = body.decode(match.group(1) if match else 'utf-8', errors='replace')
+            except LookupError:
+                html = body.decode('utf-8', errors='replace')
+            try:
+                processor = WebPageProcessor(url, html)
+                page = ParsedPage(processor.full_text, processor.links)
+            except Exception as e:
+                logger.error(f"Ошибка парсинга {url}: {str(e)}")
+        results.append((url, status, content_type, page))
+    return results
+
 class Web1Crawler:
     def __init__(self, start_url: str, domain: str, max_pages: int = 1000, 
                  max_depth: int = 3, delay: float = 0.5, concurrency: int = 10,
-                 output_file: str = "web_crawler_output.txt"):
+                 output_file: str = "web_crawler_output.txt",
+                 graph_file: Optional[str] = "data/link_graph.npz",
+                 use_sitemaps: bool = False, max_sitemaps: int = 50,
+                 documents: bool = False, doc_concurrency: int = 2,
+                 doc_max_file_size: int = 20 * 1024 * 1024,
+                 doc_max_bytes: int = 500 * 1024 * 1024,
+                 documents_dir: str = "data/documents",
+                 warc_dir: Optional[str] = None):
         self.start_url = start_url
         self.domain = domain
         self.max_pages = max_pages
@@ -29,11 +71,27 @@ class Web1Crawler:
             "subdomains": set(),
             "external_links": {"total": 0, "unique": set()},
             "files": {"pdf": 0, "doc": 0, "docx": 0, "total": 0, "unique": set()},
-            "error_links": []
+            "error_links": [],
+            "sitemap_urls": 0,
+            "warc_records": 0
         }
         self.session = None
         self.semaphore = asyncio.Semaphore(concurrency)
         self.txt_file = output_file
+        self.graph_file = graph_file
+        self.link_graph = LinkGraph()
+        self.use_sitemaps = use_sitemaps
+        self.max_sitemaps = max_sitemaps
+        # Дата последнего изменения страниц из sitemap (для повторных обходов)
+        self.lastmod: Dict[str, Any] = {}
+        self.documents = documents
+        self.doc_concurrency = doc_concurrency
+        self.doc_max_file_size = doc_max_file_size
+        self.doc_max_bytes = doc_max_bytes
+        self.documents_dir = documents_dir
+        self.document_pipeline: Optional[DocumentPipeline] = None
+        self.warc_dir = warc_dir
+        self.warc_writer: Optional[WarcWriter] = None
         self._validate_initial_parameters()
 
     def _validate_initial_parameters(self):
@@ -50,6 +108,20 @@ class Web1Crawler:
         try:
             connector = aiohttp.TCPConnector(use_dns_cache=False)
             self.session = aiohttp.ClientSession(connector=connector)
+            if self.warc_dir:
+                self.warc_writer = WarcWriter(self.warc_dir)
+            if self.documents:
+                # Документы загружаются отдельным конвейером со своими лимитами
+                self.document_pipeline = DocumentPipeline(
+                    self.session,
+                    sink=self._write_to_txt,
+                    can_fetch=self.check_document_robots,
+                    output_dir=self.documents_dir,
+                    concurrency=self.doc_concurrency,
+                    max_file_size=self.doc_max_file_size,
+                    max_total_bytes=self.doc_max_bytes
+                )
+                await self.document_pipeline.start()
             return self
         except Exception as e:
             logger.error(f"Ошибка инициализации сессии: {str(e)}")
@@ -57,8 +129,12 @@ class Web1Crawler:
 
     async def __aexit__(self, exc_type, exc, tb):
         try:
+            if self.document_pipeline:
+                await self.document_pipeline.close()
             if self.session:
                 await self.session.close()
+            if self.warc_writer:
+                self.warc_writer.close()
         except Exception as e:
             logger.error(f"Ошибка закрытия сессии: {str(e)}")
 
@@ -72,6 +148,15 @@ class Web1Crawler:
             logger.warning(f"Ошибка проверки robots.txt для {url}: {str(e)}")
             return True  # По умолчанию разрешаем при ошибке проверки
 
+    async def check_document_robots(self, url: str) -> bool:
+        # Документ может лежать на поддомене: применяются правила robots.txt его хоста
+        host = urlparse(url).netloc
+        try:
+            return await check_robots_txt_async(url, host, self.session)
+        except Exception as e:
+            logger.warning(f"Ошибка проверки robots.txt для {url}: {str(e)}")
+            return True
+
     async def fetch_page(self, url: str) -> Optional[str]:
         if not self.session:
             logger.error("Сессия не инициализирована")
@@ -88,8 +173,18 @@ class Web1Crawler:
                 
                 # Загрузка страницы
                 async with self.session.get(url, timeout=10) as response:
-                    response.raise_for_status()
                     content_type = response.headers.get('Content-Type', '')
+                    if self.warc_writer:
+                        # Ответ сохраняется до проверок, чтобы replay видел то же, что и обход.
+                        # Тело не-HTML ответов не читается: в архив попадают только заголовки
+                        if 'text/html' in content_type:
+                            body, truncated = await response.read(), None
+                        else:
+                            body, truncated = b"", "unspecified"
+                        self.warc_writer.write_response(url, response.status, response.reason,
+                                                        response.raw_headers, body, truncated=truncated)
+                        self.stats["warc_records"] += 1
+                    response.raise_for_status()
                     
                     # Проверка типа контента
                     if 'text/html' not in content_type:
@@ -123,6 +218,10 @@ class Web1Crawler:
             logger.error(f"Ошибка парсинга {url}: {str(e)}")
             return []
 
+        return self._record_page(url, depth, processor)
+
+    def _record_page(self, url: str, depth: int, processor) -> List[Tuple[str, int]]:
+        # Общая часть обхода и replay: processor - WebPageProcessor или ParsedPage
         # Логирование первой строки текста
         try:
             first_line = processor.full_text.split("\n")[0] if processor.full_text else "Нет текста"
@@ -148,6 +247,7 @@ class Web1Crawler:
         try:
             self.stats["total_pages"] += 1
             self.stats["internal_pages"] += 1
+            self.link_graph.add_page(url)
         except Exception as e:
             logger.error(f"Ошибка обновления статистики для {url}: {str(e)}")
 
@@ -167,12 +267,14 @@ class Web1Crawler:
                     logger.warning(f"Ошибка обновления счетчика ссылок для {url}: {str(e)}")
 
                 # Обработка файлов
-                if any(full_url.endswith(ext) for ext in ('.pdf', '.doc', '.docx')):
-                    self._process_file_link(full_url)
+                ext = self._file_extension(parsed)
+                if ext:
+                    self._process_file_link(parsed, full_url, ext)
                     continue
 
                 # Обработка внутренних ссылок
                 if self.domain in parsed.netloc:
+                    self.link_graph.add_edge(url, full_url)
                     self._process_internal_link(parsed, full_url, depth, new_links)
                 else:
                     self._process_external_link(parsed.netloc)
@@ -199,13 +301,25 @@ class Web1Crawler:
             logger.error(f"Ошибка записи в файл {self.txt_file}: {str(e)}")
             raise
 
-    def _process_file_link(self, url: str):
+    @staticmethod
+    def _file_extension(parsed: ParseResult) -> Optional[str]:
+        # Расширение берется из пути: регистр и параметры запроса (?download=1) не важны
+        ext = parsed.path.rsplit('.', 1)[-1].lower() if '.' in parsed.path else ''
+        return ext if ext in FILE_EXTENSIONS else None
+
+    def _is_crawl_host(self, parsed: ParseResult) -> bool:
+        host = (parsed.hostname or '').lower()
+        domain = self.domain.lower()
+        return host == domain or host.endswith(f".{domain}")
+
+    def _process_file_link(self, parsed: ParseResult, url: str, ext: str):
         try:
-            ext = url.split('.')[-1].lower()
-            if ext in ('pdf', 'doc', 'docx'):
-                self.stats["files"][ext] += 1
-                self.stats["files"]["total"] += 1
-                self.stats["files"]["unique"].add(url)
+            self.stats["files"][ext] += 1
+            self.stats["files"]["total"] += 1
+            self.stats["files"]["unique"].add(url)
+            # Загружаются только документы сайта и его поддоменов, внешние файлы лишь учитываются
+            if self.document_pipeline and self._is_crawl_host(parsed):
+                self.document_pipeline.submit(url, ext)
         except Exception as e:
             logger.warning(f"Ошибка обработки файловой ссылки {url}: {str(e)}")
 
@@ -254,9 +368,41 @@ class Web1Crawler:
                 logger.error(f"Критическая ошибка в воркере: {str(e)}")
                 self.queue.task_done()
 
+    async def seed_from_sitemaps(self) -> int:
+        sitemaps = await get_sitemaps_async(self.domain, self.session)
+        default_sitemap = f"https://{self.domain}/sitemap.xml"
+        if default_sitemap not in sitemaps:
+            sitemaps.append(default_sitemap)
+
+        seeded = 0
+        entries = iter_sitemap_urls(sitemaps, self.session, max_sitemaps=self.max_sitemaps)
+        try:
+            async for url, lastmod in entries:
+                if url == self.start_url or not self._is_crawl_host(urlparse(url)):
+                    continue
+                # Страницы из sitemap считаются найденными по ссылке со стартовой
+                self.queue.put_nowait((url, 1))
+                if lastmod is not None:
+                    self.lastmod[url] = lastmod
+                seeded += 1
+                # Очередь заполнена на весь лимит страниц: остальные sitemap не загружаются
+                if seeded >= self.max_pages:
+                    break
+        finally:
+            await entries.aclose()
+
+        self.stats["sitemap_urls"] = seeded
+        logger.info(f"Из sitemap добавлено {seeded} URL в очередь, lastmod известен для {len(self.lastmod)}")
+        return seeded
+
     async def crawl(self) -> Dict[str, Any]:
         try:
             await self.queue.put((self.start_url, 0))
+            if self.use_sitemaps:
+                try:
+                    await self.seed_from_sitemaps()
+                except Exception as e:
+                    logger.error(f"Ошибка загрузки sitemap: {str(e)}")
             tasks = [asyncio.create_task(self.worker()) for _ in range(self.concurrency)]
             
             await self.queue.join()
@@ -264,30 +410,90 @@ class Web1Crawler:
             # Отмена задач после завершения
             for task in tasks:
                 task.cancel()
+
+            if self.document_pipeline:
+                await self.document_pipeline.close()
+
+            if self.graph_file:
+                try:
+                    self.link_graph.save(self.graph_file)
+                except Exception as e:
+                    logger.error(f"Не удалось сохранить граф ссылок: {str(e)}")
             
             # Формирование итоговой статистики
+            return self._build_stats()
+        except Exception as e:
+            logger.exception("Критическая ошибка в процессе краулинга")
             return {
-                "total_pages": self.stats["total_pages"],
-                "total_links": self.stats["total_links"],
-                "internal_pages": self.stats["internal_pages"],
-                "broken_pages": self.stats["broken_pages"],
-                "subdomains": list(self.stats["subdomains"]),
-                "external_links": {
-                    "total": self.stats["external_links"]["total"],
-                    "unique": list(self.stats["external_links"]["unique"])
-                },
-                "files": {
-                    "total": self.stats["files"]["total"],
-                    "pdf": self.stats["files"]["pdf"],
-                    "doc": self.stats["files"]["doc"],
-                    "docx": self.stats["files"]["docx"],
-                    "unique": list(self.stats["files"]["unique"])
-                },
-                "error_links": self.stats["error_links"]
+                "error": str(e),
+                **{k: v for k, v in self.stats.items()}
             }
+
+    def replay(self, warc_dir: str, workers: Optional[int] = None, crawl: Optional[str] = None) -> Dict[str, Any]:
+        # Повторная обработка сохраненных ответов без сети: разбор HTML идет параллельно
+        # в пуле процессов, а статистика и граф обновляются тем же кодом, что и при обходе.
+        # Файлы идут от новых к старым: для повторяющегося URL учитывается первая (последняя по времени) запись
+        files = select_crawl_files(warc_dir, crawl)
+        if not files:
+            raise ValueError(f"В {warc_dir} нет WARC-файлов")
+
+        tasks = []
+        for path in files:
+            entries = read_index(path)
+            for start in range(0, len(entries), REPLAY_CHUNK_RECORDS):
+                tasks.append((path, entries[start:start + REPLAY_CHUNK_RECORDS]))
+        logger.info(f"Replay: {len(files)} WARC-файлов, {sum(len(chunk) for _, chunk in tasks)} записей")
+
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                chunks = executor.map(_parse_warc_chunk, *zip(*tasks)) if tasks else []
+                for results in chunks:
+                    for url, status, content_type, page in results:
+                        self.stats["warc_records"] += 1
+                        if url in self.visited:
+                            continue
+                        self.visited.add(url)
+                        if status >= 400:
+                            self.stats["broken_pages"] += 1
+                            self.stats["error_links"].append(url)
+                        elif page is None:
+                            logger.info(f"Неподдерживаемый Content-Type: {content_type} для {url}")
+                        else:
+                            self._record_page(url, 0, page)
+
+            if self.graph_file:
+                try:
+                    self.link_graph.save(self.graph_file)
+                except Exception as e:
+                    logger.error(f"Не удалось сохранить граф ссылок: {str(e)}")
+            return self._build_stats()
         except Exception as e:
-            logger.exception("Критическая ошибка в процессе краулинга")
+            logger.exception("Критическая ошибка при повторной обработке WARC")
             return {
                 "error": str(e),
                 **{k: v for k, v in self.stats.items()}
-            }
\ No newline at end of file
+            }
+
+    def _build_stats(self) -> Dict[str, Any]:
+        return {
+            "total_pages": self.stats["total_pages"],
+            "total_links": self.stats["total_links"],
+            "internal_pages": self.stats["internal_pages"],
+            "broken_pages": self.stats["broken_pages"],
+            "subdomains": list(self.stats["subdomains"]),
+            "external_links": {
+                "total": self.stats["external_links"]["total"],
+                "unique": list(self.stats["external_links"]["unique"])
+            },
+            "files": {
+                "total": self.stats["files"]["total"],
+                "pdf": self.stats["files"]["pdf"],
+                "doc": self.stats["files"]["doc"],
+                "docx": self.stats["files"]["docx"],
+                "unique": list(self.stats["files"]["unique"])
+            },
+            "error_links": self.stats["error_links"],
+            "sitemap_urls": self.stats["sitemap_urls"],
+            "documents": dict(self.document_pipeline.stats) if self.document_pipeline else None,
+            "warc_records": self.stats["warc_records"]
+        }
@@ -6,12 +6,16 @@ from telethon.errors import (
     AuthKeyError,
     ApiIdInvalidError
 )
-from telethon.tl.functions.messages import GetHistoryRequest
+from telethon.tl.functions.messages import GetHistoryRequest, GetMessagesViewsRequest
 from datetime import datetime, timedelta, timezone
-import matplotlib.pyplot as plt
 import logging
-from auth import AuthManager
-import pandas as pd
+from auth import SessionPool
+from utils.channel_discovery import ChannelDiscovery
+from utils.keyword_matcher import KeywordMatcher, load_keyword_file
+from utils.sync_state import SyncState
+from utils.message_buffer import ColumnarMessageBuffer, create_sink
+from utils.stream_stats import TelegramAggregates
+from utils.plotting import render_daily_posts, render_in_background
 import os
 
 logging.basicConfig(
@@ -20,22 +24,62 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+HISTORY_BATCH_SIZE = 100  # Ограничение Telegram API на один запрос истории
+VIEWS_BATCH_SIZE = 100  # Ограничение Telegram API на один запрос счетчиков
+COUNTER_COLUMNS = ('views', 'comments', 'forwards')  # Порядок совпадает с METRICS в агрегатах
+DISCOVERY_MODES = ("search", "dialogs", "both")
+
+SEARCH_KEYWORDS = {
+    'МГУ': [
+        'МГУ', 'Московский государственный университет',
+        'МГУ им. Ломоносова', 'Московский университет',
+        'MSU', 'Lomonosov Moscow State University'
+    ],
+    'СПбГУ': [
+        'СПбГУ', 'Санкт-Петербургский государственный университет',
+        'Санкт-Петербургский университет', 'СПб университет',
+        'SPbU', 'Saint Petersburg State University'
+    ]
+}
+
 class TelegramCrawler:
-    def __init__(self, max_messages=100, delay=0.2):
-        self.df = pd.DataFrame()
+    def __init__(self, max_messages=100, delay=0.2, concurrency=4, days=30,
+                 full_sync=False, refresh_days=0, state_file="data/telegram_sync_state.json",
+                 output_format="csv", chunk_size=10000, sessions=None, discovery="search",
+                 discovery_ttl=24 * 3600, keywords_file=None,
+                 aggregates_file="data/telegram_aggregates.json", plot_async=False,
+                 client_factory=None):
         self.max_messages = max_messages
+        self.days = days
+        self.full_sync = full_sync
+        self.refresh_days = refresh_days
+        self.sync_state = SyncState(state_file)
+        self._peers = {}
         self.delay = delay
-        self.auth_manager = AuthManager()
-        self.client = None
-        self.stats = {
-            "channels": [],
-            "university": [],
-            "messages": [],
-            "views": [],
-            "comments": [],
-            "forwards": [],
-            "date": []
-        }
+        self.concurrency = concurrency
+        # Задержка применяется только к запросам к API, а не к обработке сообщений
+        # client_factory позволяет подменить TelegramClient (например, локальным бэкендом для замеров)
+        self.pool = SessionPool(sessions, concurrency=concurrency, interval=delay,
+                                client_factory=client_factory)
+        self.discovery = discovery
+        self.keywords = {university: list(names) for university, names in SEARCH_KEYWORDS.items()}
+        if keywords_file:
+            for label, names in load_keyword_file(keywords_file).items():
+                self.keywords.setdefault(label, []).extend(
+                    name for name in names if name not in self.keywords[label]
+                )
+        # Автомат строится один раз и используется для названий каналов и тегов сообщений
+        self.matcher = KeywordMatcher(self.keywords)
+        self.channel_discovery = ChannelDiscovery(self.pool, ttl=discovery_ttl, matcher=self.matcher)
+        self.output_format = output_format
+        self.chunk_size = chunk_size
+        self.buffer = None
+        # Агрегаты текущего запуска и накопленные по всем запускам
+        self.aggregates = TelegramAggregates()
+        self.aggregates_file = aggregates_file
+        self.total_aggregates = None
+        self.plot_async = plot_async
+        self.plot_process = None
         self._validate_parameters()
 
     def _validate_parameters(self):
@@ -43,11 +87,23 @@ class TelegramCrawler:
             raise ValueError("Максимальное количество сообщений должно быть > 0")
         if self.delay < 0:
             raise ValueError("Задержка не может быть отрицательной")
+        if self.days <= 0:
+            raise ValueError("Период сбора сообщений должен быть > 0 дней")
+        if self.refresh_days < 0:
+            raise ValueError("Период обновления счетчиков не может быть отрицательным")
+        if self.chunk_size < 1:
+            raise ValueError("Размер чанка должен быть >= 1")
+        if self.output_format not in ("csv", "parquet"):
+            raise ValueError(f"Неподдерживаемый формат вывода: {self.output_format}")
+        if self.concurrency < 1:
+            raise ValueError("Количество параллельных запросов должно быть >= 1")
+        if self.discovery not in DISCOVERY_MODES:
+            raise ValueError(f"Неподдерживаемый режим поиска каналов: {self.discovery}")
 
     async def start(self):
         try:
-            self.client = await self.auth_manager.start()
-            logger.info("Успешное подключение к Telegram API")
+            sessions = await self.pool.start()
+            logger.info(f"Успешное подключение к Telegram API, активных сессий: {len(sessions)}")
         except (AuthKeyError, ApiIdInvalidError) as e:
             logger.error("Ошибка аутентификации: проверьте API_ID и API_HASH")
             raise
@@ -56,69 +112,146 @@ class TelegramCrawler:
             raise
 
     async def find_channels(self):
-        SEARCH_KEYWORDS = {
-            'МГУ': [
-                'МГУ', 'Московский государственный университет',
-                'МГУ им. Ломоносова', 'Московский университет',
-                'MSU', 'Lomonosov Moscow State University'
-            ],
-            'СПбГУ': [
-                'СПбГУ', 'Санкт-Петербургский государственный университет',
-                'Санкт-Петербургский университет', 'СПб университет',
-                'SPbU', 'Saint Petersburg State University'
-            ]
-        }
+        matches = []
+        logger.info(f"Поиск каналов для {', '.join(self.keywords)}")
+
+        if self.discovery in ("search", "both"):
+            # Серверный поиск: число запросов зависит от ключевых слов, а не от числа диалогов
+            for channel, university in await self.channel_discovery.discover(self.keywords):
+                self._peers.setdefault(channel.id, {}).update(channel.peers)
+                matches.append((channel, university))
+
+        if self.discovery in ("dialogs", "both"):
+            # Один проход по диалогам каждой сессии для всех университетов
+            scanned = set()
+            await asyncio.gather(*(
+                self._scan_dialogs(session, matches, scanned) for session in self.pool.sessions
+            ))
+
+        # Канал загружается один раз, даже если найден обоими способами или подходит
+        # нескольким университетам: отметка синхронизации общая для канала
+        channels = {}
+        for dialog, university in matches:
+            entry = channels.setdefault(dialog.id, (dialog, []))
+            if university not in entry[1]:
+                entry[1].append(university)
+
+        # История каналов загружается параллельно, число запросов ограничено лимитером
+        results = await asyncio.gather(
+            *(self._fetch_channel(dialog, universities) for dialog, universities in channels.values()),
+            return_exceptions=True
+        )
+        for (dialog, _), result in zip(channels.values(), results):
+            if isinstance(result, Exception):
+                logger.error(f"Ошибка загрузки истории {dialog.name}: {str(result)}")
 
+    async def _scan_dialogs(self, session, matches, scanned):
         try:
-            for university, names in SEARCH_KEYWORDS.items():
-                logger.info(f"Поиск каналов для {university}")
-                
-                async for dialog in self.client.iter_dialogs():
-                    try:
-                        await asyncio.sleep(self.delay)
-                        dialog_name = dialog.name.lower()
-                        if any(name.lower() in dialog_name for name in names):
-                            logger.info(f"Найден канал/группа: {dialog.name}")
-                            await self.search_messages(dialog, dialog.name, university)
-                    except ChannelPrivateError:
-                        logger.warning(f"Доступ к каналу {dialog.name} запрещен")
-                    except Exception as e:
-                        logger.error(f"Ошибка обработки диалога {dialog.name}: {str(e)}")
+            async for dialog in session.client.iter_dialogs():
+                try:
+                    # Один канал может быть доступен нескольким сессиям со своими access_hash
+                    self._peers.setdefault(dialog.id, {})[session.name] = (
+                        getattr(dialog, 'input_entity', None) or dialog.id
+                    )
+                    if dialog.id in scanned:
+                        continue
+                    scanned.add(dialog.id)
+
+                    for university in sorted(self.matcher.labels(dialog.name or "")):
+                        logger.info(f"Найден канал/группа для {university}: {dialog.name}")
+                        matches.append((dialog, university))
+                except Exception as e:
+                    logger.error(f"Ошибка обработки диалога {dialog.name}: {str(e)}")
 
         except FloodWaitError as e:
-            logger.error(f"Telegram FloodWait: ждем {e.seconds} секунд")
-            await asyncio.sleep(e.seconds)
+            # Диалоги этой сессии пропускаются, остальные сессии продолжают работу
+            logger.error(f"Telegram FloodWait при чтении диалогов сессии {session.name}: {e.seconds} секунд")
+            session.limiter.penalize(e.seconds, "GetDialogsRequest")
+            self.pool.record_flood_wait(session, "GetDialogsRequest", e.seconds)
         except Exception as e:
-            logger.exception("Критическая ошибка при поиске каналов")
+            logger.exception(f"Критическая ошибка при поиске каналов в сессии {session.name}")
             raise
 
-    async def search_messages(self, dialog, channel, university):
+    async def _fetch_channel(self, dialog, universities):
         try:
-            offset_date = datetime.now(timezone.utc) - timedelta(days=30)
-            
-            result = await self.client(GetHistoryRequest(
-                peer=dialog.id,
-                offset_id=0,
-                offset_date=offset_date,
+            await self.search_messages(dialog, dialog.name, universities)
+        except ChannelPrivateError:
+            logger.warning(f"Доступ к каналу {dialog.name} запрещен")
+
+    async def iter_history(self, peers, since=None, limit=None, min_id=0, offset_id=0):
+        # Постраничное чтение истории от новых сообщений к старым через offset_id
+        fetched = 0
+
+        while limit is None or fetched < limit:
+            batch_size = HISTORY_BATCH_SIZE if limit is None else min(HISTORY_BATCH_SIZE, limit - fetched)
+            # Страницы могут загружаться разными сессиями: offset_id общий для канала
+            result = await self.pool.request(
+                GetHistoryRequest,
+                peers=peers,
+                offset_id=offset_id,
+                offset_date=None,
                 add_offset=0,
-                limit=min(self.max_messages, 100),  # Telegram API limit
+                limit=batch_size,
                 max_id=0,
-                min_id=0,
+                min_id=min_id,
                 hash=0
-            ))
+            )
 
-            if not result.messages:
-                logger.info(f"Нет сообщений для {channel}")
+            messages = result.messages
+            if not messages:
                 return
 
-            for i, message in enumerate(result.messages):
-                if i >= self.max_messages:
+            for message in messages:
+                if since is not None and message.date < since:
+                    return
+                yield message
+                fetched += 1
+                if limit is not None and fetched >= limit:
+                    return
+
+            if len(messages) < batch_size:
+                return
+            offset_id = messages[-1].id
+
+    async def search_messages(self, dialog, channel, universities):
+        try:
+            since = datetime.now(timezone.utc) - timedelta(days=self.days)
+            peers = self._peers[dialog.id]
+            budget = self.max_messages
+            count = 0
+
+            while budget > 0:
+                # Сначала догружается пропуск, оставшийся после прошлого запуска, затем
+                # запрашиваются только сообщения новее сохраненной отметки
+                if self.full_sync:
+                    offset_id, min_id, gap = 0, 0, False
+                else:
+                    offset_id, min_id, gap = self.sync_state.resume_point(dialog.id)
+                newest = oldest = None
+                fetched = 0
+
+                async for message in self.iter_history(peers, since=since, limit=budget,
+                                                       min_id=min_id, offset_id=offset_id):
+                    if newest is None:
+                        newest = message
+                    oldest = message
+                    fetched += 1
+                    for university in universities:
+                        try:
+                            self.process_message(message, channel, university, channel_id=dialog.id)
+                        except Exception as e:
+                            logger.error(f"Ошибка обработки сообщения {message.id}: {str(e)}")
+
+                # Отметка сдвигается, только если диапазон до min_id загружен полностью
+                complete = fetched < budget
+                self.sync_state.record_pass(dialog.id, newest, oldest, complete, gap, title=channel)
+                budget -= fetched
+                count += fetched
+                if not (gap and complete):
                     break
-                try:
-                    await self.process_message(message, channel, university)
-                    await asyncio.sleep(self.delay)
-                except Exception as e:
-                    logger.error(f"Ошибка обработки сообщения {message.id}: {str(e)}")
+
+            if not count:
+                logger.info(f"Нет новых сообщений для {channel}")
 
         except (FloodWaitError, MsgIdInvalidError) as e:
             logger.warning(f"Telegram API error: {e}")
@@ -127,22 +260,32 @@ class TelegramCrawler:
             logger.exception(f"Критическая ошибка при получении истории {channel}")
             raise
 
-    async def process_message(self, message, channel, university):
+    def process_message(self, message, channel, university, channel_id=None):
         try:
-            self.stats["university"].append(university)
-            self.stats["channels"].append(channel) 
-            self.stats['messages'].append(getattr(message, 'message', ''))
-            
-            # Безопасное получение числовых данных
-            self.stats["views"].append(getattr(message, 'views', 0) or 0)
-            self.stats["forwards"].append(getattr(message, 'forwards', 0) or 0)
-            self.stats["date"].append(message.date.astimezone(timezone.utc))
-            
             # Обработка комментариев
             comments = 0
             if hasattr(message, 'replies') and message.replies:
                 comments = getattr(message.replies, 'replies', 0) or 0
-            self.stats["comments"].append(comments)
+
+            text = getattr(message, 'message', '') or ''
+            views = getattr(message, 'views', 0) or 0
+            forwards = getattr(message, 'forwards', 0) or 0
+            appended = self.buffer.append(
+                channel_id=channel_id or 0,
+                message_id=message.id,
+                channel=channel,
+                university=university,
+                text=text,
+                views=views,
+                comments=comments,
+                forwards=forwards,
+                date=message.date,
+                tags=self.matcher.tags(text)
+            )
+            # Статистика обновляется по мере поступления сообщений, без повторного обхода данных
+            if appended:
+                self.aggregates.update(university, channel_id or 0, message.date.astimezone(timezone.utc),
+                                       views, comments, forwards)
 
         except AttributeError as e:
             logger.error(f"Ошибка доступа к атрибуту в сообщении {message.id}: {str(e)}")
@@ -150,60 +293,133 @@ class TelegramCrawler:
             logger.exception(f"Неизвестная ошибка обработки сообщения {message.id}")
             raise
 
+    def merge_aggregates(self):
+        self.total_aggregates = TelegramAggregates.load(self.aggregates_file)
+        self.total_aggregates.merge(self.aggregates)
+
+    def save_aggregates(self):
+        try:
+            self.total_aggregates.save(self.aggregates_file)
+            logger.info(f"Агрегаты сохранены в {self.aggregates_file}")
+        except Exception as e:
+            logger.error(f"Ошибка сохранения агрегатов: {str(e)}")
+
     def generate_plot(self):
         try:
-            if self.df.empty:
+            # График строится по накопленным дневным агрегатам: O(групп), а не O(сообщений)
+            aggregates = self.total_aggregates or self.aggregates
+            daily = aggregates.daily_counts()
+            if not daily:
                 logger.warning("Нет данных для построения графика")
                 return
 
-            self.df['date'] = pd.to_datetime(self.df['date']).dt.date
-            daily_posts = self.df.groupby(['university', 'date']).size().unstack(level=0, fill_value=0)
-            
-            plt.figure(figsize=(16, 10))
-            ax = daily_posts.plot(
-                kind='line',
-                marker='o',
-                linewidth=1,
-                markersize=5,
-                title='Количество публикаций по дням'
-            )
-            
-            ax.set_xlabel('Дата')
-            ax.set_ylabel('Количество публикаций')
-            ax.grid(True, linestyle='--', alpha=0.7)
-            ax.legend(title='Университет')
-            
-            plt.xticks(rotation=45)
-            plt.tight_layout()
-            
-            os.makedirs('plots', exist_ok=True)
-            plt.savefig('plots/daily_posts.png', dpi=300, bbox_inches='tight')
-            logger.info("График сохранен в plots/daily_posts.png")
+            if self.plot_async:
+                # Краулер не ждет отрисовки: график строится в отдельном процессе
+                self.plot_process = render_in_background(daily)
+            else:
+                render_daily_posts(daily)
 
         except Exception as e:
             logger.error(f"Ошибка генерации графика: {str(e)}")
             raise
 
-    def save_to_csv(self):
+    def save_data(self):
         try:
-            if not self.stats["messages"]:
-                logger.warning("Нет данных для сохранения")
+            self.buffer.close()
+            if not self.buffer.written:
+                logger.warning("Нет новых данных для сохранения")
                 return
-                
-            self.df = pd.DataFrame(self.stats)
-            os.makedirs('data', exist_ok=True)
-            self.df.to_csv('data/Telegram_posts.csv', index=False, encoding='utf-8')
-            logger.info("Данные сохранены в data/Telegram_posts.csv")
+            logger.info(f"Добавлено {self.buffer.written} сообщений, пропущено дубликатов: {self.buffer.skipped}")
 
         except Exception as e:
-            logger.error(f"Ошибка сохранения CSV: {str(e)}")
+            logger.error(f"Ошибка сохранения данных: {str(e)}")
             raise
 
+    async def refresh_counters(self):
+        # Пакетное обновление просмотров, репостов и комментариев у недавних публикаций.
+        # Данные читаются и переписываются порциями: память зависит от числа недавних публикаций
+        try:
+            import pandas as pd
+
+            sink = self.buffer.sink
+            since = datetime.now(timezone.utc) - timedelta(days=self.refresh_days)
+            columns = ['channel_id', 'message_id', 'university', 'date', *COUNTER_COLUMNS]
+            recent_parts = []
+            for chunk in sink.iter_chunks(columns):
+                dates = pd.to_datetime(chunk['date'], utc=True)
+                mask = dates >= since
+                if mask.any():
+                    recent_parts.append(chunk[mask].assign(date=dates[mask]))
+            if not recent_parts:
+                return
+            recent = pd.concat(recent_parts, ignore_index=True)
+
+            updates = {}
+            try:
+                for channel_id, group in recent.groupby('channel_id'):
+                    peers = self._peers.get(channel_id)
+                    if not peers:
+                        continue
+                    ids = sorted(int(i) for i in group['message_id'].unique())
+                    for start in range(0, len(ids), VIEWS_BATCH_SIZE):
+                        batch = ids[start:start + VIEWS_BATCH_SIZE]
+                        result = await self.pool.request(
+                            GetMessagesViewsRequest, peers=peers, id=batch, increment=False
+                        )
+                        for message_id, counters in zip(batch, result.views):
+                            updates[(int(channel_id), message_id)] = (
+                                counters.views or 0,
+                                counters.replies.replies if counters.replies else 0,
+                                counters.forwards or 0
+                            )
+            except FloodWaitError as e:
+                logger.warning(f"Обновление счетчиков прервано FloodWait: {e.seconds} секунд, "
+                               f"сохраняются полученные значения")
+            if not updates:
+                return
+
+            # Накопленные агрегаты получают новые значения вместо учтенных при первой загрузке
+            if self.total_aggregates is not None:
+                for row in recent.itertuples(index=False):
+                    new = updates.get((int(row.channel_id), int(row.message_id)))
+                    old = (int(row.views), int(row.comments), int(row.forwards))
+                    if new is not None and new != old:
+                        self.total_aggregates.revise(row.university, int(row.channel_id), row.date, old, new)
+
+            values = pd.DataFrame(list(updates.values()), columns=list(COUNTER_COLUMNS),
+                                  index=pd.MultiIndex.from_tuples(list(updates)))
+
+            def apply_updates(chunk) -> bool:
+                keys = pd.MultiIndex.from_arrays([chunk['channel_id'], chunk['message_id']])
+                mask = keys.isin(values.index)
+                if not mask.any():
+                    return False
+                chunk.loc[mask, list(COUNTER_COLUMNS)] = values.reindex(keys[mask]).to_numpy()
+                return True
+
+            sink.update_chunks(apply_updates)
+            logger.info(f"Обновлены счетчики для {len(updates)} публикаций")
+
+        except Exception as e:
+            logger.error(f"Ошибка обновления счетчиков: {str(e)}")
+
     async def crawl(self):
         try:
             await self.start()
+            os.makedirs('data', exist_ok=True)
+            # Полная синхронизация восстанавливает данные заново: дубликаты отсекаются
+            # только по ключам, которые действительно есть в файле, а не по отметкам
+            is_stored = None if self.full_sync else self.sync_state.is_stored
+            self.buffer = ColumnarMessageBuffer(create_sink(self.output_format),
+                                                chunk_size=self.chunk_size, is_stored=is_stored)
             await self.find_channels()
-            self.save_to_csv()
+            self.save_data()
+            self.sync_state.save()
+            # Агрегаты сохраняются после обновления счетчиков, чтобы квантили учитывали новые значения
+            self.merge_aggregates()
+            if self.refresh_days:
+                await self.refresh_counters()
+            self.save_aggregates()
             self.generate_plot()
             
         except KeyboardInterrupt:
@@ -211,18 +427,13 @@ class TelegramCrawler:
         except Exception as e:
             logger.exception("Критическая ошибка в процессе краулинга")
         finally:
-            if self.client:
+            if self.pool.sessions:
+                flood_report = self.pool.flood_report()
+                if flood_report:
+                    logger.info(f"FloodWait по сессиям и методам: {flood_report}")
                 try:
-                    await self.auth_manager.disconnect()
+                    await self.pool.disconnect()
                 except Exception as e:
                     logger.error(f"Ошибка закрытия сессии: {str(e)}")
 
-        return {
-            "total_posts": len(self.df),
-            "channels": self.df['channels'].nunique() if not self.df.empty else 0,
-            "views": self.df['views'].mean() if not self.df.empty else 0,
-            "comments": self.df["comments"].mean() if not self.df.empty else 0,
-            "forwards": self.df["forwards"].mean() if not self.df.empty else 0,
-            "date_range": (self.stats["date"][0].strftime('%Y-%m-%d'), 
-                         self.stats["date"][-1].strftime('%Y-%m-%d')) if self.stats["date"] else None
-        }
\ No newline at end of file
+        return self.aggregates.summary()
\ No newline at end of file
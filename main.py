@@ -2,8 +2,6 @@ import asyncio
 from dotenv import load_dotenv
 import os
 import argparse
-from crawlers.web1_crawler import Web1Crawler
-from crawlers.web2_telegram_crawler import TelegramCrawler
 import logging
 
 load_dotenv()
@@ -15,7 +13,50 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-async def run_web1(domain, max_pages, max_depth, delay, concurrency):
+# Тяжелые зависимости (telethon, pandas, matplotlib, numpy) импортируются
+# внутри подкоманд, чтобы не замедлять запуск остальных команд
+
+def print_graph_summary(graph, start_url: str = None, top: int = 10):
+    analysis = graph.analyze(start_url=start_url, top=top)
+
+    print("\n=== ГРАФ ССЫЛОК ===")
+    print(f"Узлов: {analysis['nodes']}, ребер: {analysis['edges']}")
+    print(f"Недостижимые страницы: {len(analysis['unreachable'])}")
+    print(f"Тупиковые страницы: {len(analysis['dead_ends'])}")
+    print(f"Страницы без входящих ссылок: {len(analysis['orphans'])}")
+    if analysis['pagerank_top']:
+        print(f"Топ-{len(analysis['pagerank_top'])} по PageRank:")
+        for url, rank in analysis['pagerank_top']:
+            print(f"  {rank:.6f}  {url}")
+    if analysis['in_degree_top']:
+        print(f"Топ-{len(analysis['in_degree_top'])} по входящим ссылкам:")
+        for url, count in analysis['in_degree_top']:
+            print(f"  {count:>8}  {url}")
+
+def print_web1_stats(stats):
+    print("\n=== ИТОГОВАЯ СТАТИСТИКА ===")
+    print(f"Обработано страниц: {stats['total_pages']}")
+    if stats['sitemap_urls']:
+        print(f"URL из sitemap: {stats['sitemap_urls']}")
+    print(f"Внутренние страницы: {stats['internal_pages']}")
+    print(f"Ошибочные ссылки: {len(stats['error_links'])}")
+    print(f"Поддомены: {len(stats['subdomains'])}")
+    print(f"Внешние ресурсы: Общее количество: {stats['external_links']['total']}, "
+          f"Уникальные: {len(stats['external_links']['unique'])}")
+    print(f"Файлы: {stats['files']['total']} (PDF: {stats['files']['pdf']}, "
+          f"DOC: {stats['files']['doc']}, DOCX: {stats['files']['docx']})")
+    if stats['documents']:
+        docs = stats['documents']
+        print(f"Документы: загружено {docs['downloaded']} ({docs['bytes'] / 1024 / 1024:.1f} МБ), "
+              f"текст извлечен из {docs['extracted']}, пропущено {docs['skipped']}")
+    if stats['warc_records']:
+        print(f"Записей WARC: {stats['warc_records']}")
+
+async def run_web1(domain, max_pages, max_depth, delay, concurrency, use_sitemaps=False,
+                   documents=False, doc_concurrency=2, doc_max_file_size_mb=20, doc_max_bytes_mb=500,
+                   warc_dir=None):
+    from crawlers.web1_crawler import Web1Crawler
+
     try:
         async with Web1Crawler(
             start_url=f"https://{domain}",
@@ -23,7 +64,13 @@ async def run_web1(domain, max_pages, max_depth, delay, concurrency):
             max_pages=max_pages,
             max_depth=max_depth,
             delay=delay,
-            concurrency=concurrency
+            concurrency=concurrency,
+            use_sitemaps=use_sitemaps,
+            documents=documents,
+            doc_concurrency=doc_concurrency,
+            doc_max_file_size=doc_max_file_size_mb * 1024 * 1024,
+            doc_max_bytes=doc_max_bytes_mb * 1024 * 1024,
+            warc_dir=warc_dir
         ) as crawler:
             stats = await crawler.crawl()
             
@@ -31,22 +78,59 @@ async def run_web1(domain, max_pages, max_depth, delay, concurrency):
                 logger.error(f"Краулер завершился с ошибкой: {stats['error']}")
                 return
                 
-            print("\n=== ИТОГОВАЯ СТАТИСТИКА ===")
-            print(f"Обработано страниц: {stats['total_pages']}")
-            print(f"Внутренние страницы: {stats['internal_pages']}")
-            print(f"Ошибочные ссылки: {len(stats['error_links'])}")
-            print(f"Поддомены: {len(stats['subdomains'])}")
-            print(f"Внешние ресурсы: Общее количество: {stats['external_links']['total']}, "
-                  f"Уникальные: {len(stats['external_links']['unique'])}")
-            print(f"Файлы: {stats['files']['total']} (PDF: {stats['files']['pdf']}, "
-                  f"DOC: {stats['files']['doc']}, DOCX: {stats['files']['docx']})")
+            print_web1_stats(stats)
+            print_graph_summary(crawler.link_graph, start_url=crawler.start_url)
                   
     except ValueError as e:
         logger.error(f"Ошибка валидации параметров: {e}")
     except Exception as e:
         logger.exception("Произошла критическая ошибка в Web1Crawler")
 
-async def run_web2(max_messages: int):
+def run_replay(domain, warc_dir, output_file, workers, crawl=None):
+    from crawlers.web1_crawler import Web1Crawler
+
+    try:
+        crawler = Web1Crawler(
+            start_url=f"https://{domain}",
+            domain=domain,
+            output_file=output_file
+        )
+        stats = crawler.replay(warc_dir, workers=workers, crawl=crawl)
+
+        if "error" in stats:
+            logger.error(f"Повторная обработка завершилась с ошибкой: {stats['error']}")
+            return
+
+        print_web1_stats(stats)
+        print_graph_summary(crawler.link_graph, start_url=crawler.start_url)
+
+    except ValueError as e:
+        logger.error(f"Ошибка валидации параметров: {e}")
+    except Exception as e:
+        logger.exception("Произошла критическая ошибка при повторной обработке WARC")
+
+def run_async(args, coro):
+    if args.profile:
+        from utils.profiling import run_profiled
+        coro = run_profiled(coro, output=args.profile_output, slow_threshold=args.slow_callback_ms / 1000)
+    asyncio.run(coro)
+
+def run_analyze(graph_file: str, start_url: str, top: int):
+    from utils.link_graph import LinkGraph
+
+    try:
+        graph = LinkGraph.load(graph_file)
+        print_graph_summary(graph, start_url=start_url, top=top)
+    except FileNotFoundError:
+        logger.error(f"Файл графа ссылок не найден: {graph_file}")
+    except Exception as e:
+        logger.exception("Произошла критическая ошибка при анализе графа ссылок")
+
+async def run_web2(max_messages: int, concurrency: int, days: int,
+                   full_sync: bool, refresh_days: int, output_format: str, sessions: str,
+                   discovery: str, keywords_file: str, plot_async: bool):
+    from crawlers.web2_telegram_crawler import TelegramCrawler
+
     try:
         api_id = os.getenv("API_ID")
         api_hash = os.getenv("API_HASH")
@@ -55,7 +139,16 @@ async def run_web2(max_messages: int):
             raise ValueError("Отсутствуют учетные данные Telegram API")
         
         crawler = TelegramCrawler(
-            max_messages=max_messages
+            max_messages=max_messages,
+            concurrency=concurrency,
+            days=days,
+            full_sync=full_sync,
+            refresh_days=refresh_days,
+            output_format=output_format,
+            sessions=[name.strip() for name in sessions.split(",") if name.strip()] if sessions else None,
+            discovery=discovery,
+            keywords_file=keywords_file,
+            plot_async=plot_async
         )
         stats = await crawler.crawl()
 
@@ -65,6 +158,10 @@ async def run_web2(max_messages: int):
         print(f"Просмотры: {stats.get('views', 0)}")
         print(f"Комментарии: {stats.get('comments', 0)}")
         print(f"Репосты: {stats.get('forwards', 0)}")
+        for university, group in stats.get('universities', {}).items():
+            views = group['views']
+            print(f"{university}: публикаций {group['posts']}, просмотры - медиана {views['median']:.0f}, "
+                  f"p95 {views['p95']:.0f}, максимум {views['max']}")
         print("============================")
         
     except ValueError as e:
@@ -75,6 +172,12 @@ async def run_web2(max_messages: int):
 def main():
     try:
         parser = argparse.ArgumentParser(description="Поисковый робот для Web 1.0/Web 2.0")
+        parser.add_argument("--profile", action="store_true",
+                            help="Профилирование web1/web2: задержка event loop и долгие шаги корутин")
+        parser.add_argument("--profile-output", default=None,
+                            help="Файл для сэмплирующего профилировщика (folded stacks для flamegraph)")
+        parser.add_argument("--slow-callback-ms", type=float, default=100,
+                            help="Порог долгого шага event loop в миллисекундах")
         subparsers = parser.add_subparsers(dest="command", required=True)
 
         # Web 1.0 parser
@@ -89,27 +192,108 @@ def main():
                                 help="Задержка между запросами")
         web1_parser.add_argument("--concurrency", type=int, default=10, 
                                 help="Количество параллельных запросов")
+        web1_parser.add_argument("--sitemaps", action="store_true",
+                                help="Заполнить очередь URL из sitemap (robots.txt и /sitemap.xml)")
+        web1_parser.add_argument("--documents", action="store_true",
+                                help="Загружать PDF/DOC/DOCX и извлекать из них текст")
+        web1_parser.add_argument("--doc-concurrency", type=int, default=2,
+                                help="Количество параллельных загрузок документов")
+        web1_parser.add_argument("--doc-max-file-size", type=int, default=20,
+                                help="Максимальный размер одного документа в МБ")
+        web1_parser.add_argument("--doc-max-bytes", type=int, default=500,
+                                help="Общий лимит объема загружаемых документов в МБ")
+        web1_parser.add_argument("--warc-dir", default=None,
+                                help="Сохранять ответы сервера в WARC-файлы в указанной папке")
 
         # Web 2.0 parser
         web2_parser = subparsers.add_parser("web2", help="Запуск краулера для Web 2.0 (Telegram)")
         web2_parser.add_argument("--max-messages", type=int, default=100, 
-                                help="Максимальное количество сообщений")
+                                help="Максимальное количество сообщений на канал")
+        web2_parser.add_argument("--days", type=int, default=30,
+                                help="Период сбора сообщений в днях")
+        web2_parser.add_argument("--full-sync", action="store_true",
+                                help="Игнорировать сохраненные отметки и загрузить историю заново")
+        web2_parser.add_argument("--refresh-days", type=int, default=0,
+                                help="Обновить счетчики публикаций за последние N дней")
+        web2_parser.add_argument("--output-format", choices=["csv", "parquet"], default="csv",
+                                help="Формат сохранения публикаций")
+        web2_parser.add_argument("--sessions", default=None,
+                                help="Имена сессий Telegram через запятую (по умолчанию TELEGRAM_SESSIONS)")
+        web2_parser.add_argument("--discovery", choices=["search", "dialogs", "both"], default="search",
+                                help="Поиск каналов: глобальный поиск Telegram, подписки аккаунта или оба")
+        web2_parser.add_argument("--keywords-file", default=None,
+                                help="Файл с дополнительными ключевыми словами в формате 'Метка: слово'")
+        web2_parser.add_argument("--plot-async", action="store_true",
+                                help="Строить график в отдельном процессе, не задерживая вывод статистики")
+        web2_parser.add_argument("--concurrency", type=int, default=4,
+                                help="Количество параллельных запросов к Telegram API")
+
+        # Offline replay of saved WARC files
+        replay_parser = subparsers.add_parser("replay", help="Повторная обработка WARC-файлов без загрузки сайтов")
+        replay_parser.add_argument("--domain", required=True,
+                                  help="Домен, для которого записывались WARC-файлы")
+        replay_parser.add_argument("--warc-dir", default="data/warc",
+                                  help="Папка с WARC-файлами")
+        replay_parser.add_argument("--output-file", default="web_crawler_replay.txt",
+                                  help="Файл для текста страниц")
+        replay_parser.add_argument("--workers", type=int, default=None,
+                                  help="Количество процессов для разбора (по умолчанию - число ядер)")
+        replay_parser.add_argument("--crawl", default=None,
+                                  help="Обход для обработки (crawl-<время начала>) или all; по умолчанию - последний")
+
+        # Link graph analysis
+        analyze_parser = subparsers.add_parser("analyze", help="Анализ графа ссылок после обхода Web 1.0")
+        analyze_parser.add_argument("--graph", default="data/link_graph.npz",
+                                   help="Файл с графом ссылок")
+        analyze_parser.add_argument("--start-url", default=None,
+                                   help="Стартовый URL для поиска недостижимых страниц")
+        analyze_parser.add_argument("--top", type=int, default=10,
+                                   help="Количество страниц в топе")
 
         args = parser.parse_args()
 
         if args.command == "web1":
-            asyncio.run(run_web1(
+            run_async(args, run_web1(
                 domain=args.domain,
                 max_pages=args.max_pages,
                 max_depth=args.max_depth,
                 delay=args.delay,
-                concurrency=args.concurrency
+                concurrency=args.concurrency,
+                use_sitemaps=args.sitemaps,
+                documents=args.documents,
+                doc_concurrency=args.doc_concurrency,
+                doc_max_file_size_mb=args.doc_max_file_size,
+                doc_max_bytes_mb=args.doc_max_bytes,
+                warc_dir=args.warc_dir
             ))
         elif args.command == "web2":
-            asyncio.run(run_web2(
-                max_messages=args.max_messages
+            run_async(args, run_web2(
+                max_messages=args.max_messages,
+                concurrency=args.concurrency,
+                days=args.days,
+                full_sync=args.full_sync,
+                refresh_days=args.refresh_days,
+                output_format=args.output_format,
+                sessions=args.sessions,
+                discovery=args.discovery,
+                keywords_file=args.keywords_file,
+                plot_async=args.plot_async
             ))
-            
+        elif args.command == "analyze":
+            run_analyze(
+                graph_file=args.graph,
+                start_url=args.start_url,
+                top=args.top
+            )
+        elif args.command == "replay":
+            run_replay(
+                domain=args.domain,
+                warc_dir=args.warc_dir,
+                output_file=args.output_file,
+                workers=args.workers,
+                crawl=args.crawl
+            )
+
     except argparse.ArgumentError as e:
         logger.error(f"Ошибка в аргументах командной строки: {e}")
         parser.print_help()
@@ -0,0 +1,52 @@
+# parsers/parser_document.py
+import logging
+import shutil
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+# Функции верхнего уровня: вызываются в пуле процессов и должны сериализоваться
+
+def _extract_pdf(path: str) -> str:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        logger.warning("Для извлечения текста из PDF установите pypdf")
+        return ""
+    reader = PdfReader(path)
+    return "\n".join(page.extract_text() or "" for page in reader.pages)
+
+def _extract_docx(path: str) -> str:
+    try:
+        import docx
+    except ImportError:
+        logger.warning("Для извлечения текста из DOCX установите python-docx")
+        return ""
+    document = docx.Document(path)
+    return "\n".join(paragraph.text for paragraph in document.paragraphs if paragraph.text)
+
+def _extract_doc(path: str) -> str:
+    # Для старого формата DOC используется внешняя утилита antiword
+    antiword = shutil.which("antiword")
+    if not antiword:
+        logger.warning("Для извлечения текста из DOC установите antiword")
+        return ""
+    result = subprocess.run([antiword, path], capture_output=True, timeout=60)
+    return result.stdout.decode("utf-8", errors="replace")
+
+EXTRACTORS = {
+    "pdf": _extract_pdf,
+    "docx": _extract_docx,
+    "doc": _extract_doc,
+}
+
+def extract_document_text(path: str, ext: str) -> str:
+    extractor = EXTRACTORS.get(ext)
+    if extractor is None:
+        logger.warning(f"Неподдерживаемый тип документа: {ext}")
+        return ""
+    try:
+        return extractor(path).replace("\xa0", " ").strip()
+    except Exception as e:
+        logger.error(f"Ошибка извлечения текста из {path}: {str(e)}")
+        return ""
@@ -0,0 +1,131 @@
+# utils/channel_discovery.py
+from telethon.errors import FloodWaitError
+from telethon.tl.functions.contacts import SearchRequest
+from telethon.tl.types import Channel, Chat, InputPeerChannel, InputPeerChat
+from telethon import utils as tl_utils
+from typing import Dict, List, Tuple
+import asyncio
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+class DiscoveredChannel:
+    def __init__(self, peer_id: int, name: str, username: str = None):
+        # Интерфейс совместим с диалогом Telethon: id и name
+        self.id = peer_id
+        self.name = name
+        self.username = username
+        self.peers: Dict[str, object] = {}
+
+class ChannelDiscovery:
+    def __init__(self, pool, cache_file: str = "data/telegram_discovery_cache.json",
+                 ttl: float = 24 * 3600, batch_size: int = 5, limit: int = 100, matcher=None):
+        self.pool = pool
+        # contacts.Search ищет и по описаниям, и нечетко: результат принимается, только если
+        # ключевые слова университета есть в названии или имени пользователя канала
+        self.matcher = matcher
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.batch_size = batch_size
+        self.limit = limit
+        self.cache: Dict[str, dict] = self._load_cache()
+
+    def _load_cache(self) -> Dict[str, dict]:
+        if not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, encoding='utf-8') as file:
+                return json.load(file)
+        except Exception as e:
+            logger.warning(f"Ошибка чтения кеша поиска каналов {self.cache_file}: {str(e)}")
+            return {}
+
+    def _save_cache(self):
+        try:
+            os.makedirs(os.path.dirname(self.cache_file) or '.', exist_ok=True)
+            tmp_path = f"{self.cache_file}.tmp"
+            with open(tmp_path, mode='w', encoding='utf-8') as file:
+                json.dump(self.cache, file, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_file)
+        except Exception as e:
+            logger.error(f"Ошибка сохранения кеша поиска каналов {self.cache_file}: {str(e)}")
+
+    def _cached(self, keyword: str):
+        entry = self.cache.get(keyword)
+        if not entry or time.time() - entry["fetched_at"] > self.ttl:
+            return None
+        # Кеш действителен только для сессии, которая выполняла поиск
+        if not any(session.name == entry["session"] for session in self.pool.sessions):
+            return None
+        return entry
+
+    async def _search(self, keyword: str) -> dict:
+        entry = self._cached(keyword)
+        if entry is not None:
+            logger.debug(f"Результаты поиска '{keyword}' взяты из кеша")
+            return entry
+
+        session, found = await self.pool.request_with_session(SearchRequest, q=keyword, limit=self.limit)
+        chats = []
+        for chat in found.chats:
+            if isinstance(chat, Channel) and chat.access_hash is not None:
+                chats.append({"type": "channel", "id": chat.id, "access_hash": chat.access_hash,
+                              "title": chat.title, "username": chat.username})
+            elif isinstance(chat, Chat):
+                chats.append({"type": "chat", "id": chat.id, "access_hash": None,
+                              "title": chat.title, "username": None})
+
+        entry = {"fetched_at": time.time(), "session": session.name, "chats": chats}
+        self.cache[keyword] = entry
+        return entry
+
+    @staticmethod
+    def _to_peer(chat: dict):
+        if chat["type"] == "channel":
+            return InputPeerChannel(channel_id=chat["id"], access_hash=chat["access_hash"])
+        return InputPeerChat(chat_id=chat["id"])
+
+    async def discover(self, keywords: Dict[str, List[str]]) -> List[Tuple[DiscoveredChannel, str]]:
+        queries = [(university, keyword) for university, names in keywords.items() for keyword in names]
+        channels: Dict[int, DiscoveredChannel] = {}
+        matches = set()
+        rejected = set()
+
+        # Запросы выполняются пачками, чтобы не упираться в лимиты contacts.Search
+        for start in range(0, len(queries), self.batch_size):
+            batch = queries[start:start + self.batch_size]
+            results = await asyncio.gather(
+                *(self._search(keyword) for _, keyword in batch),
+                return_exceptions=True
+            )
+            for (university, keyword), result in zip(batch, results):
+                if isinstance(result, FloodWaitError):
+                    logger.warning(f"FloodWait при поиске '{keyword}': {result.seconds} секунд")
+                    continue
+                if isinstance(result, Exception):
+                    logger.error(f"Ошибка поиска каналов по '{keyword}': {str(result)}")
+                    continue
+
+                for chat in result["chats"]:
+                    if self.matcher is not None:
+                        labels = self.matcher.labels(f"{chat['title']} {chat['username'] or ''}")
+                        if university not in labels:
+                            rejected.add((chat["id"], university))
+                            continue
+                    peer = self._to_peer(chat)
+                    peer_id = tl_utils.get_peer_id(peer)
+                    channel = channels.get(peer_id)
+                    if channel is None:
+                        channel = DiscoveredChannel(peer_id, chat["title"], chat["username"])
+                        channels[peer_id] = channel
+                    channel.peers.setdefault(result["session"], peer)
+                    matches.add((peer_id, university))
+
+        self._save_cache()
+        logger.info(f"Найдено каналов через поиск: {len(channels)} по {len(queries)} запросам")
+        if rejected:
+            logger.info(f"Отброшено результатов поиска без ключевых слов в названии: {len(rejected)}")
+        return [(channels[peer_id], university) for peer_id, university in sorted(matches)]
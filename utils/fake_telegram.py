@@ -0,0 +1,179 @@
+# utils/fake_telegram.py
+# Локальная имитация Telegram API для замеров и проверок без сети и аккаунтов.
+# Подключается через client_factory в AuthManager/SessionPool/TelegramCrawler
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from telethon import utils as tl_utils
+from telethon.errors import ChannelPrivateError, FloodWaitError
+from telethon.tl import types
+from utils.keyword_matcher import normalize_text
+import asyncio
+import logging
+import random
+
+logger = logging.getLogger(__name__)
+
+_TEXTS = [
+    "Открыт прием заявок на летнюю школу {label} для студентов и аспирантов",
+    "Лекция приглашенного профессора пройдет в главном здании {label}",
+    "Расписание сессии обновлено, проверьте личный кабинет",
+    "Команда {label} вышла в финал студенческой олимпиады по программированию",
+    "День открытых дверей: факультеты, кафедры и лаборатории",
+    "Научная конференция молодых ученых принимает тезисы до конца месяца",
+    "Стипендиальная комиссия опубликовала списки получателей",
+    "Спортивный клуб {label} приглашает на отборочные соревнования",
+]
+
+class FakeChannel:
+    def __init__(self, channel_id: int, title: str, label: str, messages: int):
+        self.id = channel_id
+        self.title = title
+        self.label = label
+        self.messages = messages
+        self.access_hash = channel_id * 7919
+        self.input_peer = types.InputPeerChannel(channel_id=channel_id, access_hash=self.access_hash)
+        self.texts = [text.format(label=label) for text in _TEXTS]
+
+class FakeDialog:
+    # Подмножество Dialog из Telethon, которое использует краулер
+    def __init__(self, channel: FakeChannel):
+        self.id = tl_utils.get_peer_id(types.PeerChannel(channel.id))
+        self.name = channel.title
+        self.input_entity = channel.input_peer
+
+class FakeTelegramBackend:
+    def __init__(self, labels: List[str], channels_per_label: int = 10, messages_per_channel: int = 1000,
+                 span_days: float = 7, latency: float = 0.0, flood_rate: float = 0.0,
+                 flood_seconds: int = 1, seed: int = 0):
+        if channels_per_label < 1 or messages_per_channel < 1:
+            raise ValueError("Количество каналов и сообщений должно быть >= 1")
+        self.latency = latency
+        self.flood_rate = flood_rate
+        self.flood_seconds = flood_seconds
+        self.span = timedelta(days=span_days)
+        self.now = datetime.now(timezone.utc)
+        self.calls = Counter()
+        self.flood_waits = Counter()
+        self._random = random.Random(seed)
+        # FloodWait действует на метод в конкретной сессии до истечения штрафа
+        self._blocked_until: Dict[tuple, float] = {}
+        self.channels: Dict[int, FakeChannel] = {}
+        channel_id = 1000
+        for label in labels:
+            for number in range(1, channels_per_label + 1):
+                channel_id += 1
+                self.channels[channel_id] = FakeChannel(
+                    channel_id, f"{label} новости {number}", label, messages_per_channel
+                )
+
+    @property
+    def total_messages(self) -> int:
+        return sum(channel.messages for channel in self.channels.values())
+
+    def client_factory(self, session_name: str, api_id=None, api_hash=None) -> "FakeTelegramClient":
+        return FakeTelegramClient(self, session_name)
+
+    def _message(self, channel: FakeChannel, message_id: int) -> types.Message:
+        age = self.span * (channel.messages - message_id) / channel.messages
+        return types.Message(
+            id=message_id,
+            peer_id=types.PeerChannel(channel.id),
+            date=self.now - age,
+            message=channel.texts[message_id % len(channel.texts)],
+            post=True,
+            views=100 + (message_id * 7919 + channel.id) % 5000,
+            forwards=message_id % 17,
+            replies=types.MessageReplies(replies=message_id % 5, replies_pts=0)
+        )
+
+    def _channel(self, peer) -> FakeChannel:
+        channel = self.channels.get(getattr(peer, "channel_id", None))
+        if channel is None:
+            raise ChannelPrivateError(request=None)
+        return channel
+
+    def get_history(self, request) -> types.messages.Messages:
+        # Семантика messages.getHistory: от новых к старым, id < offset_id, id > min_id
+        channel = self._channel(request.peer)
+        top = channel.messages
+        if request.offset_id:
+            top = min(top, request.offset_id - 1)
+        if request.max_id:
+            top = min(top, request.max_id - 1)
+        bottom = max(request.min_id + 1, top - request.limit + 1, 1)
+        messages = [self._message(channel, message_id) for message_id in range(top, bottom - 1, -1)]
+        return types.messages.Messages(messages=messages, chats=[], users=[])
+
+    def get_views(self, request) -> types.messages.MessageViews:
+        channel = self._channel(request.peer)
+        views = []
+        for message_id in request.id:
+            message = self._message(channel, message_id)
+            views.append(types.MessageViews(views=message.views, forwards=message.forwards,
+                                            replies=message.replies))
+        return types.messages.MessageViews(views=views, chats=[], users=[])
+
+    def search(self, request) -> types.contacts.Found:
+        query = normalize_text(request.q)
+        chats = [
+            types.Channel(id=channel.id, title=channel.title, photo=types.ChatPhotoEmpty(),
+                          date=self.now, broadcast=True, access_hash=channel.access_hash)
+            for channel in self.channels.values() if query in normalize_text(channel.title)
+        ]
+        return types.contacts.Found(my_results=[], results=[], chats=chats[:request.limit], users=[])
+
+    async def handle(self, session_name: str, request):
+        method = type(request).__name__
+        self.calls[method] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        loop_time = asyncio.get_running_loop().time()
+        blocked_until = self._blocked_until.get((session_name, method), 0)
+        if blocked_until > loop_time:
+            self.flood_waits[method] += 1
+            raise FloodWaitError(request=None, capture=max(1, round(blocked_until - loop_time)))
+        if self.flood_rate and self._random.random() < self.flood_rate:
+            self._blocked_until[(session_name, method)] = loop_time + self.flood_seconds
+            self.flood_waits[method] += 1
+            raise FloodWaitError(request=None, capture=self.flood_seconds)
+
+        handlers = {
+            "GetHistoryRequest": self.get_history,
+            "GetMessagesViewsRequest": self.get_views,
+            "SearchRequest": self.search,
+        }
+        handler = handlers.get(method)
+        if handler is None:
+            raise NotImplementedError(f"Метод {method} не поддерживается тестовым бэкендом")
+        return handler(request)
+
+class FakeTelegramClient:
+    # Интерфейс TelegramClient, который использует краулер
+    def __init__(self, backend: FakeTelegramBackend, session_name: str):
+        self.backend = backend
+        self.session_name = session_name
+        self._connected = False
+
+    async def connect(self):
+        self._connected = True
+
+    async def is_user_authorized(self) -> bool:
+        return True
+
+    def is_connected(self) -> bool:
+        return self._connected
+
+    async def disconnect(self):
+        self._connected = False
+
+    async def __call__(self, request):
+        return await self.backend.handle(self.session_name, request)
+
+    async def iter_dialogs(self, limit: Optional[int] = None):
+        self.backend.calls["GetDialogsRequest"] += 1
+        for number, channel in enumerate(self.backend.channels.values()):
+            if limit is not None and number >= limit:
+                return
+            yield FakeDialog(channel)
@@ -0,0 +1,72 @@
+# utils/flood_limiter.py
+from telethon.errors import FloodWaitError
+from typing import Dict
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class SessionCooldown(Exception):
+    # Сессия получила FloodWait по методу, пока запрос ждал слота: запрос нужно отдать другой сессии
+    def __init__(self, method: str, seconds: float):
+        super().__init__(f"Метод {method} на паузе еще {seconds:.1f} с")
+        self.method = method
+        self.seconds = seconds
+
+class FloodWaitLimiter:
+    # Лимитер одной сессии: параллельность, интервал между запросами и штрафы FloodWait по методам.
+    # Повторы и выбор другой сессии выполняет SessionPool
+    def __init__(self, concurrency: int = 4, interval: float = 0.0):
+        if concurrency < 1:
+            raise ValueError("Количество параллельных запросов должно быть >= 1")
+        self.concurrency = concurrency
+        self.interval = interval
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.in_flight = 0
+        self._method_resume_at: Dict[str, float] = {}
+        self._next_slot = 0.0
+
+    def cooldown_for(self, method: str) -> float:
+        return max(0.0, self._method_resume_at.get(method, 0.0) - time.monotonic())
+
+    def penalize(self, seconds: float, method: str):
+        resume_at = time.monotonic() + seconds
+        self._method_resume_at[method] = max(self._method_resume_at.get(method, 0.0), resume_at)
+
+    async def wait_cooldown(self, method: str):
+        while self.cooldown_for(method) > 0:
+            await asyncio.sleep(self.cooldown_for(method))
+
+    def _check_cooldown(self, method: str):
+        cooldown = self.cooldown_for(method)
+        if cooldown > 0:
+            raise SessionCooldown(method, cooldown)
+
+    async def _wait_interval(self):
+        # Минимальный интервал между началом запросов к API
+        if self.interval <= 0:
+            return
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def attempt(self, method: str, func, *args, **kwargs):
+        # Одна попытка запроса: при FloodWait штраф записывается, ошибка пробрасывается
+        self.in_flight += 1
+        try:
+            async with self.semaphore:
+                # Штраф проверяется уже после получения слота: ожидание в очереди могло совпасть
+                # с FloodWait. Слот не удерживается на время штрафа, запрос возвращается пулу
+                self._check_cooldown(method)
+                await self._wait_interval()
+                self._check_cooldown(method)
+                try:
+                    return await func(*args, **kwargs)
+                except FloodWaitError as e:
+                    self.penalize(e.seconds, method)
+                    raise
+        finally:
+            self.in_flight -= 1
@@ -0,0 +1,117 @@
+# utils/keyword_matcher.py
+from collections import deque
+from typing import Dict, Iterable, List, Set, Tuple
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Латинские буквы, совпадающие по написанию с кириллическими (МГУ с латинской M и т.п.)
+_HOMOGLYPHS = str.maketrans({
+    'a': 'а', 'c': 'с', 'e': 'е', 'o': 'о', 'p': 'р', 'x': 'х', 'y': 'у',
+    'k': 'к', 'm': 'м', 't': 'т', 'h': 'н', 'b': 'в'
+})
+_YO = str.maketrans({'ё': 'е'})
+_SPACES = re.compile(r'\s+')
+# Слово, в котором латинские буквы соседствуют с кириллическими
+_MIXED_WORD = re.compile(r'[a-zа-я]*(?:[a-z][а-я]|[а-я][a-z])[a-zа-я]*')
+
+def _fold_homoglyphs(match) -> str:
+    return match.group().translate(_HOMOGLYPHS)
+
+def normalize_text(text: str) -> str:
+    # Нормализация применяется и к шаблонам, и к тексту, поэтому совпадения согласованы.
+    # Латиница заменяется кириллицей только в словах со смешанным написанием: чисто
+    # латинские слова (bymsu, hmsu) не должны превращаться в кириллические
+    text = _SPACES.sub(' ', text.casefold()).translate(_YO)
+    return _MIXED_WORD.sub(_fold_homoglyphs, text)
+
+def load_keyword_file(path: str) -> Dict[str, List[str]]:
+    # Формат: "Метка: ключевое слово", строки с # - комментарии
+    keywords: Dict[str, List[str]] = {}
+    with open(path, encoding='utf-8') as file:
+        for line_no, line in enumerate(file, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            label, sep, keyword = line.partition(':')
+            if not sep or not label.strip() or not keyword.strip():
+                logger.warning(f"Некорректная строка {line_no} в {path}: {line}")
+                continue
+            keywords.setdefault(label.strip(), []).append(keyword.strip())
+    return keywords
+
+class KeywordMatcher:
+    def __init__(self, keywords: Dict[str, Iterable[str]]):
+        # Автомат Ахо-Корасик: переходы, суффиксные ссылки и выходы по состояниям
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Выход: метка, ключевое слово, длина шаблона и нужны ли проверки границ слова слева/справа
+        self._out: List[List[Tuple[str, str, int, bool, bool]]] = [[]]
+        self.keywords = {label: list(names) for label, names in keywords.items()}
+
+        for label, names in self.keywords.items():
+            for name in names:
+                pattern = normalize_text(name.strip())
+                if pattern:
+                    self._add(pattern, (label, name, len(pattern),
+                                        pattern[0].isalnum(), pattern[-1].isalnum()))
+        self._build()
+
+    def _add(self, pattern: str, output: Tuple[str, str, int, bool, bool]):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        if output not in self._out[state]:
+            self._out[state].append(output)
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fallback = self._goto[fail].get(char, 0)
+                self._fail[next_state] = fallback if fallback != next_state else 0
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def find(self, text: str) -> Set[Tuple[str, str]]:
+        # Один линейный проход по нормализованному тексту. Совпадение засчитывается только
+        # целым словом: соседние символы не должны быть буквами или цифрами (самгу - не МГУ)
+        found = set()
+        if not text:
+            return found
+        goto, fail, out = self._goto, self._fail, self._out
+        normalized = normalize_text(text)
+        last = len(normalized) - 1
+        state = 0
+        for end, char in enumerate(normalized):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if not out[state]:
+                continue
+            for label, name, length, check_left, check_right in out[state]:
+                start = end - length + 1
+                if check_left and start > 0 and normalized[start - 1].isalnum():
+                    continue
+                if check_right and end < last and normalized[end + 1].isalnum():
+                    continue
+                found.add((label, name))
+        return found
+
+    def labels(self, text: str) -> Set[str]:
+        return {label for label, _ in self.find(text)}
+
+    def tags(self, text: str) -> str:
+        return ';'.join(sorted(f"{label}:{keyword}" for label, keyword in self.find(text)))
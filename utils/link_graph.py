@@ -0,0 +1,165 @@
+# utils/link_graph.py
+from array import array
+from typing import Dict, List, Optional, Any
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+class LinkGraph:
+    def __init__(self):
+        # URL интернируются в целочисленные идентификаторы,
+        # ребра хранятся в компактных массивах int32
+        self._ids: Dict[str, int] = {}
+        self.urls: List[str] = []
+        self.src = array('i')
+        self.dst = array('i')
+        self.crawled = set()
+
+    def __len__(self) -> int:
+        return len(self.urls)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.src)
+
+    def intern(self, url: str) -> int:
+        node = self._ids.get(url)
+        if node is None:
+            node = len(self.urls)
+            self._ids[url] = node
+            self.urls.append(url)
+        return node
+
+    def add_page(self, url: str) -> int:
+        node = self.intern(url)
+        self.crawled.add(node)
+        return node
+
+    def add_edge(self, source: str, target: str):
+        self.src.append(self.intern(source))
+        self.dst.append(self.intern(target))
+
+    def save(self, path: str):
+        import numpy as np
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            # URL хранятся одним UTF-8 блоком со смещениями: массив строк фиксированной
+            # ширины занимал бы (число URL x самый длинный URL x 4 байта)
+            encoded = [url.encode('utf-8') for url in self.urls]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+            np.savez_compressed(
+                path,
+                src=np.frombuffer(self.src, dtype=np.int32),
+                dst=np.frombuffer(self.dst, dtype=np.int32),
+                crawled=np.fromiter(self.crawled, dtype=np.int32, count=len(self.crawled)),
+                url_blob=np.frombuffer(b"".join(encoded), dtype=np.uint8),
+                url_offsets=offsets
+            )
+            logger.info(f"Граф ссылок сохранен в {path}: {len(self)} узлов, {self.edge_count} ребер")
+        except Exception as e:
+            logger.error(f"Ошибка сохранения графа ссылок {path}: {str(e)}")
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> "LinkGraph":
+        import numpy as np
+        with np.load(path, allow_pickle=False) as data:
+            graph = cls()
+            if 'url_blob' in data:
+                blob = data['url_blob'].tobytes()
+                offsets = data['url_offsets'].tolist()
+                graph.urls = [blob[start:end].decode('utf-8')
+                              for start, end in zip(offsets, offsets[1:])]
+            else:
+                # Формат предыдущих версий: массив строк фиксированной ширины
+                graph.urls = data['urls'].tolist()
+            graph._ids = {url: i for i, url in enumerate(graph.urls)}
+            graph.src = array('i', data['src'].astype(np.int32).tobytes())
+            graph.dst = array('i', data['dst'].astype(np.int32).tobytes())
+            graph.crawled = set(data['crawled'].tolist())
+        return graph
+
+    def analyze(self, start_url: Optional[str] = None, damping: float = 0.85,
+                tol: float = 1e-9, max_iter: int = 100, top: int = 10) -> Dict[str, Any]:
+        # NumPy/SciPy загружаются только для анализа, сбор ребер обходится без них
+        import numpy as np
+        from scipy import sparse
+        from scipy.sparse.csgraph import breadth_first_order
+
+        n = len(self.urls)
+        if n == 0:
+            return {
+                "nodes": 0, "edges": 0, "pagerank_top": [],
+                "in_degree_top": [], "unreachable": [], "dead_ends": [], "orphans": []
+            }
+
+        src = np.frombuffer(self.src, dtype=np.int32)
+        dst = np.frombuffer(self.dst, dtype=np.int32)
+        crawled = np.zeros(n, dtype=bool)
+        if self.crawled:
+            crawled[np.fromiter(self.crawled, dtype=np.int64, count=len(self.crawled))] = True
+
+        # Матрица смежности без петель; дубликаты ребер схлопываются в одно
+        mask = src != dst
+        adjacency = sparse.csr_matrix(
+            (np.ones(int(mask.sum()), dtype=np.float64), (src[mask], dst[mask])), shape=(n, n)
+        )
+        adjacency.data[:] = 1.0
+
+        out_degree = np.asarray(adjacency.sum(axis=1)).ravel()
+        in_degree = np.asarray(adjacency.sum(axis=0)).ravel()
+
+        pagerank = self._pagerank(adjacency, out_degree, damping, tol, max_iter)
+
+        start = self._ids.get(start_url) if start_url else None
+        if start is not None:
+            reachable = np.zeros(n, dtype=bool)
+            reachable[breadth_first_order(adjacency, start, directed=True,
+                                          return_predecessors=False)] = True
+            unreachable = np.flatnonzero(~reachable)
+        else:
+            unreachable = np.array([], dtype=np.int64)
+
+        # Тупиковые страницы: загружены, но не имеют исходящих ссылок
+        dead_ends = np.flatnonzero(crawled & (out_degree == 0))
+        orphans = np.flatnonzero(in_degree == 0)
+        if start is not None:
+            orphans = orphans[orphans != start]
+
+        order = np.argsort(-pagerank)[:top]
+        in_order = np.argsort(-in_degree, kind='stable')[:top]
+
+        return {
+            "nodes": n,
+            "edges": int(adjacency.nnz),
+            "pagerank_top": [(self.urls[i], float(pagerank[i])) for i in order],
+            "in_degree_top": [(self.urls[i], int(in_degree[i])) for i in in_order],
+            "unreachable": [self.urls[i] for i in unreachable],
+            "dead_ends": [self.urls[i] for i in dead_ends],
+            "orphans": [self.urls[i] for i in orphans]
+        }
+
+    @staticmethod
+    def _pagerank(adjacency, out_degree, damping: float, tol: float, max_iter: int):
+        import numpy as np
+
+        n = adjacency.shape[0]
+        inv_out = np.zeros(n, dtype=np.float64)
+        nonzero = out_degree > 0
+        inv_out[nonzero] = 1.0 / out_degree[nonzero]
+        dangling = ~nonzero
+
+        # Транспонированная матрица переходов: rank_new = M^T * (rank / out_degree)
+        transition = adjacency.T.tocsr()
+        rank = np.full(n, 1.0 / n)
+        for _ in range(max_iter):
+            dangling_mass = rank[dangling].sum()
+            new_rank = damping * (transition @ (rank * inv_out))
+            new_rank += (damping * dangling_mass + 1.0 - damping) / n
+            delta = np.abs(new_rank - rank).sum()
+            rank = new_rank
+            if delta < tol:
+                break
+        return rank
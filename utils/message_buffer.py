@@ -0,0 +1,245 @@
+# utils/message_buffer.py
+from datetime import datetime, timezone
+from typing import Callable, Iterator, List, Optional
+import glob
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+KEY_COLUMNS = ['university', 'channel_id', 'message_id']
+INT_COLUMNS = ['channel_id', 'message_id', 'views', 'comments', 'forwards']
+TEXT_COLUMNS = ['channels', 'university', 'messages', 'tags']
+COLUMNS = ['channel_id', 'message_id', 'channels', 'university', 'messages',
+           'views', 'comments', 'forwards', 'date', 'tags']
+READ_CHUNK_ROWS = 200000
+
+# Проверка по отметкам синхронизации: (channel_id, message_id) -> сообщение уже сохранено
+StoredCheck = Callable[[int, int], bool]
+# Изменение порции строк на месте; возвращает True, если порцию нужно перезаписать
+ChunkTransform = Callable[[pd.DataFrame], bool]
+
+def _filter_keys(frames: Iterator[pd.DataFrame], is_stored: Optional[StoredCheck]) -> set:
+    # Ключи читаются порциями, в памяти остаются только строки выше отметок синхронизации:
+    # обычно это сообщения, записанные при прерванном запуске до сохранения состояния
+    keys = set()
+    for frame in frames:
+        for key in zip(frame['university'], frame['channel_id'], frame['message_id']):
+            if is_stored is None or not is_stored(int(key[1]), int(key[2])):
+                keys.add(key)
+    return keys
+
+class CsvSink:
+    def __init__(self, path: str = 'data/Telegram_posts.csv'):
+        self.path = path
+        self._header = not os.path.exists(path)
+        self._migrate()
+
+    def _migrate(self):
+        if self._header:
+            return
+        header = list(pd.read_csv(self.path, nrows=0, encoding='utf-8').columns)
+        if not set(KEY_COLUMNS).issubset(header):
+            # Без идентификаторов строки нельзя сопоставить с новыми: файл сохраняется рядом
+            backup = f"{self.path}.{time.strftime('%Y%m%d%H%M%S')}.bak"
+            os.replace(self.path, backup)
+            logger.warning(f"{self.path} сохранен в старом формате без идентификаторов сообщений, "
+                           f"данные перенесены в {backup}, новые публикации пишутся в новый файл")
+            self._header = True
+            return
+        if header != COLUMNS:
+            # Дописываемые чанки должны совпадать по столбцам с заголовком файла
+            logger.info(f"Обновление столбцов {self.path} до текущего формата")
+            self.rewrite(pd.read_csv(self.path, encoding='utf-8').reindex(columns=COLUMNS, fill_value=''))
+
+    def recent_keys(self, is_stored: Optional[StoredCheck] = None) -> set:
+        if self._header:
+            return set()
+        return _filter_keys(pd.read_csv(self.path, usecols=KEY_COLUMNS, encoding='utf-8',
+                                        chunksize=READ_CHUNK_ROWS), is_stored)
+
+    def write(self, chunk: pd.DataFrame):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        chunk.to_csv(self.path, mode='w' if self._header else 'a', header=self._header,
+                     index=False, encoding='utf-8')
+        self._header = False
+
+    def load(self) -> Optional[pd.DataFrame]:
+        if not os.path.exists(self.path):
+            return None
+        return pd.read_csv(self.path, encoding='utf-8')
+
+    def iter_chunks(self, columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+        if self._header:
+            return
+        yield from pd.read_csv(self.path, usecols=columns, encoding='utf-8', chunksize=READ_CHUNK_ROWS)
+
+    def update_chunks(self, transform: ChunkTransform):
+        # Файл переписывается порциями во временный файл: в памяти одна порция, а не вся история
+        if self._header:
+            return
+        tmp_path = f"{self.path}.tmp"
+        changed = False
+        header = True
+        for chunk in pd.read_csv(self.path, encoding='utf-8', chunksize=READ_CHUNK_ROWS):
+            changed = transform(chunk) or changed
+            chunk.to_csv(tmp_path, mode='w' if header else 'a', header=header, index=False, encoding='utf-8')
+            header = False
+        if not os.path.exists(tmp_path):
+            return
+        if changed:
+            os.replace(tmp_path, self.path)
+        else:
+            os.remove(tmp_path)
+
+    def rewrite(self, df: pd.DataFrame):
+        # Запись через временный файл: сбой посреди записи не должен обрезать историю публикаций
+        tmp_path = f"{self.path}.tmp"
+        df.to_csv(tmp_path, index=False, encoding='utf-8')
+        os.replace(tmp_path, self.path)
+        self._header = False
+
+    def close(self):
+        pass
+
+class ParquetSink:
+    def __init__(self, path: str = 'data/Telegram_posts'):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ValueError("Для формата Parquet необходимо установить pyarrow")
+        self.path = path
+        self._run_id = time.strftime('%Y%m%d%H%M%S')
+        self._parts = 0
+
+    def _files(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.path, '*.parquet')))
+
+    def recent_keys(self, is_stored: Optional[StoredCheck] = None) -> set:
+        return _filter_keys((pd.read_parquet(part, columns=KEY_COLUMNS) for part in self._files()),
+                            is_stored)
+
+    def write(self, chunk: pd.DataFrame):
+        # Каждый чанк записывается отдельным файлом, существующие файлы не переписываются
+        os.makedirs(self.path, exist_ok=True)
+        part = os.path.join(self.path, f"part-{self._run_id}-{self._parts:05d}.parquet")
+        chunk.to_parquet(part, index=False)
+        self._parts += 1
+
+    def load(self) -> Optional[pd.DataFrame]:
+        files = self._files()
+        if not files:
+            return None
+        return pd.concat((pd.read_parquet(part) for part in files), ignore_index=True)
+
+    def iter_chunks(self, columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+        for part in self._files():
+            yield pd.read_parquet(part, columns=columns)
+
+    def update_chunks(self, transform: ChunkTransform):
+        # Переписываются только части, в которых изменились строки
+        for part in self._files():
+            chunk = pd.read_parquet(part)
+            if transform(chunk):
+                tmp_path = f"{part}.tmp"
+                chunk.to_parquet(tmp_path, index=False)
+                os.replace(tmp_path, part)
+
+    def rewrite(self, df: pd.DataFrame):
+        old_files = self._files()
+        os.makedirs(self.path, exist_ok=True)
+        compacted = os.path.join(self.path, f"part-{self._run_id}-compacted.parquet")
+        tmp_path = f"{compacted}.tmp"
+        df.to_parquet(tmp_path, index=False)
+        # Старые части удаляются только после того, как сжатый файл записан на место
+        os.replace(tmp_path, compacted)
+        for part in old_files:
+            if part != compacted:
+                os.remove(part)
+
+    def close(self):
+        pass
+
+def create_sink(output_format: str):
+    if output_format == 'csv':
+        return CsvSink()
+    if output_format == 'parquet':
+        return ParquetSink()
+    raise ValueError(f"Неподдерживаемый формат вывода: {output_format}")
+
+class ColumnarMessageBuffer:
+    def __init__(self, sink, chunk_size: int = 10000, is_stored: Optional[StoredCheck] = None):
+        if chunk_size < 1:
+            raise ValueError("Размер чанка должен быть >= 1")
+        self.sink = sink
+        # Сообщения до отметок синхронизации отсекаются по состоянию, а не по множеству
+        # всех ключей из файла: в памяти держатся только ключи выше отметок
+        self.is_stored = is_stored
+        self._recent = sink.recent_keys(is_stored)
+        if self._recent:
+            logger.info(f"Загружено {len(self._recent)} ключей сообщений выше отметок синхронизации")
+        self.chunk_size = chunk_size
+        self.written = 0
+        self.skipped = 0
+        # Числовые столбцы - предвыделенные массивы фиксированного размера
+        self._ints = {name: np.zeros(chunk_size, dtype=np.int64) for name in INT_COLUMNS}
+        self._dates = np.zeros(chunk_size, dtype='datetime64[us]')
+        self._texts = {name: [None] * chunk_size for name in TEXT_COLUMNS}
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, channel_id: int, message_id: int, channel: str, university: str,
+               text: str, views: int, comments: int, forwards: int, date: datetime,
+               tags: str = '') -> bool:
+        if self.is_stored is not None and self.is_stored(channel_id, message_id):
+            self.skipped += 1
+            return False
+        key = (university, channel_id, message_id)
+        if key in self._recent:
+            self.skipped += 1
+            return False
+        if self.is_stored is None:
+            self._recent.add(key)
+
+        i = self._size
+        ints = self._ints
+        ints['channel_id'][i] = channel_id
+        ints['message_id'][i] = message_id
+        ints['views'][i] = views
+        ints['comments'][i] = comments
+        ints['forwards'][i] = forwards
+        self._dates[i] = np.datetime64(date.astimezone(timezone.utc).replace(tzinfo=None), 'us')
+        texts = self._texts
+        texts['channels'][i] = channel
+        texts['university'][i] = university
+        texts['messages'][i] = text
+        texts['tags'][i] = tags
+        self._size = i + 1
+
+        if self._size >= self.chunk_size:
+            self.flush()
+        return True
+
+    def flush(self):
+        size = self._size
+        if not size:
+            return
+        columns = {name: self._ints[name][:size].copy() for name in INT_COLUMNS}
+        columns.update({name: self._texts[name][:size] for name in TEXT_COLUMNS})
+        columns['date'] = pd.DatetimeIndex(self._dates[:size].copy()).tz_localize('UTC')
+        chunk = pd.DataFrame(columns, columns=COLUMNS)
+
+        self.sink.write(chunk)
+        self.written += size
+        self._size = 0
+        logger.debug(f"Записан чанк из {size} сообщений")
+
+    def close(self):
+        self.flush()
+        self.sink.close()
@@ -0,0 +1,48 @@
+# utils/plotting.py
+from typing import Dict, Tuple
+import logging
+import multiprocessing
+import os
+
+logger = logging.getLogger(__name__)
+
+def render_daily_posts(daily: Dict[Tuple[str, object], int], path: str = 'plots/daily_posts.png'):
+    # Безоконный backend: графику не нужен дисплей, а импорт pyplot заметно быстрее
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import pandas as pd
+
+    daily_posts = pd.Series(daily).unstack(level=0, fill_value=0).sort_index()
+
+    plt.figure(figsize=(16, 10))
+    ax = daily_posts.plot(
+        kind='line',
+        marker='o',
+        linewidth=1,
+        markersize=5,
+        title='Количество публикаций по дням'
+    )
+
+    ax.set_xlabel('Дата')
+    ax.set_ylabel('Количество публикаций')
+    ax.grid(True, linestyle='--', alpha=0.7)
+    ax.legend(title='Университет')
+
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    plt.savefig(path, dpi=300, bbox_inches='tight')
+    plt.close('all')
+    logger.info(f"График сохранен в {path}")
+
+def render_in_background(daily: Dict[Tuple[str, object], int],
+                         path: str = 'plots/daily_posts.png') -> multiprocessing.Process:
+    # spawn: рабочий процесс не наследует состояние event loop и сетевых клиентов.
+    # Процесс не демонический, поэтому интерпретатор дождется его перед выходом
+    context = multiprocessing.get_context('spawn')
+    process = context.Process(target=render_daily_posts, args=(daily, path), name='plot-renderer')
+    process.start()
+    logger.info(f"Построение графика запущено в отдельном процессе (pid {process.pid})")
+    return process
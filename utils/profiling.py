@@ -0,0 +1,223 @@
+# utils/profiling.py
+from collections import Counter, deque
+from typing import Awaitable, Dict, List, Optional
+import asyncio
+import inspect
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from utils.stream_stats import QuantileSketch
+
+logger = logging.getLogger(__name__)
+
+_TASK_REPR = re.compile(r"<Task \w+ name='[^']+' coro=<(?P<coro>[\w.<>]+)\(\)")
+_HANDLE_REPR = re.compile(r"<(?:Timer)?Handle (?P<callback>[\w.<>]+)\(")
+_ASYNC_FLAGS = inspect.CO_COROUTINE | inspect.CO_ASYNC_GENERATOR
+
+def _frame_name(code) -> str:
+    return getattr(code, "co_qualname", code.co_name)
+
+def _coroutine_chain(frame) -> str:
+    # Только корутины: "Web1Crawler.worker > Web1Crawler.process_page"
+    chain = []
+    while frame is not None:
+        if frame.f_code.co_flags & _ASYNC_FLAGS:
+            chain.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    chain.reverse()
+    if len(chain) > 5:
+        # Внутренности библиотек (aiohttp, telethon) сокращаются до ближайших вызовов
+        chain = chain[:2] + ["..."] + chain[-2:]
+    return " > ".join(chain)
+
+class LoopLagMonitor:
+    # Задержка пробуждения sleep показывает, насколько event loop был занят синхронным кодом
+    def __init__(self, interval: float = 0.1, stall_threshold: float = 0.1):
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.sketch = QuantileSketch()
+        self.max_lag = 0.0
+        self.stalls = 0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run(), name="loop-lag-monitor")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - started - self.interval)
+            self.sketch.add(lag * 1000)
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.stall_threshold:
+                self.stalls += 1
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def report(self) -> dict:
+        return {
+            "samples": self.sketch.count,
+            "p50_ms": self.sketch.quantile(0.5) or 0.0,
+            "p95_ms": self.sketch.quantile(0.95) or 0.0,
+            "p99_ms": self.sketch.quantile(0.99) or 0.0,
+            "max_ms": self.max_lag * 1000,
+            "stalls": self.stalls
+        }
+
+class SlowCallbackReporter(logging.Handler):
+    # В режиме отладки asyncio пишет "Executing <Task ...> took N seconds" для долгих шагов.
+    # К моменту записи шаг уже завершен, поэтому фоновый поток заранее снимает цепочку
+    # корутин основного потока, и шаг приписывается той, что была активна чаще всего
+    def __init__(self, threshold: float = 0.1):
+        super().__init__(level=logging.WARNING)
+        self.threshold = threshold
+        self.totals: Dict[str, List[float]] = {}
+        self._loop = None
+        self._debug = False
+        self._level = logging.NOTSET
+        self._target = threading.get_ident()
+        self._recent = deque(maxlen=10000)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._debug = self._loop.get_debug()
+        self._loop.set_debug(True)
+        self._loop.slow_callback_duration = self.threshold
+        asyncio_logger = logging.getLogger("asyncio")
+        # Предупреждения asyncio не должны отсекаться уровнем корневого логгера
+        self._level = asyncio_logger.level
+        if asyncio_logger.getEffectiveLevel() > logging.WARNING:
+            asyncio_logger.setLevel(logging.WARNING)
+        asyncio_logger.addHandler(self)
+        self._thread = threading.Thread(target=self._watch, name="slow-callback-watch", daemon=True)
+        self._thread.start()
+
+    def _watch(self):
+        interval = min(self.threshold / 5, 0.01)
+        while not self._stop.wait(interval):
+            chain = _coroutine_chain(sys._current_frames().get(self._target))
+            if chain:
+                self._recent.append((time.monotonic(), chain))
+
+    def stop(self):
+        if self._thread:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        asyncio_logger = logging.getLogger("asyncio")
+        asyncio_logger.removeHandler(self)
+        asyncio_logger.setLevel(self._level)
+        if self._loop:
+            self._loop.set_debug(self._debug)
+            self._loop = None
+
+    def _describe(self, handle: str, duration: float) -> str:
+        since = time.monotonic() - duration
+        chains = Counter(chain for moment, chain in list(self._recent) if moment >= since)
+        self._recent.clear()
+        if chains:
+            return chains.most_common(1)[0][0]
+        match = _TASK_REPR.search(handle) or _HANDLE_REPR.search(handle)
+        return match.group(match.lastgroup) if match else handle[:80]
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            if not record.msg.startswith("Executing") or len(record.args) != 2:
+                return
+            handle, duration = record.args
+            stats = self.totals.setdefault(self._describe(str(handle), duration), [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += duration
+            stats[2] = max(stats[2], duration)
+        except Exception:
+            self.handleError(record)
+
+    def report(self, top: int = 10) -> List[tuple]:
+        ranked = sorted(self.totals.items(), key=lambda item: item[1][1], reverse=True)
+        return [(name, count, total, longest) for name, (count, total, longest) in ranked[:top]]
+
+class SamplingProfiler:
+    # Фоновый поток периодически снимает стек основного потока; результат пишется
+    # в формате folded stacks (flamegraph.pl, speedscope, inferno)
+    def __init__(self, output: str, interval: float = 0.005):
+        self.output = output
+        self.interval = interval
+        self.samples = Counter()
+        self._target = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{_frame_name(code)} ({os.path.basename(code.co_filename)})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        try:
+            os.makedirs(os.path.dirname(self.output) or '.', exist_ok=True)
+            with open(self.output, mode='w', encoding='utf-8') as file:
+                for stack, count in self.samples.most_common():
+                    file.write(f"{stack} {count}\n")
+            logger.info(f"Профиль ({sum(self.samples.values())} сэмплов) сохранен в {self.output}")
+        except Exception as e:
+            logger.error(f"Ошибка сохранения профиля {self.output}: {str(e)}")
+
+def print_profile_report(monitor: LoopLagMonitor, reporter: SlowCallbackReporter, elapsed: float):
+    lag = monitor.report()
+    print("\n=== ПРОФИЛИРОВАНИЕ ===")
+    print(f"Время работы: {elapsed:.1f} с")
+    print(f"Задержка event loop: p50 {lag['p50_ms']:.1f} мс, p95 {lag['p95_ms']:.1f} мс, "
+          f"p99 {lag['p99_ms']:.1f} мс, максимум {lag['max_ms']:.1f} мс, "
+          f"блокировок > {monitor.stall_threshold * 1000:.0f} мс: {lag['stalls']}")
+    slow = reporter.report()
+    if not slow:
+        print(f"Шагов дольше {reporter.threshold * 1000:.0f} мс не было")
+        return
+    print(f"Шаги дольше {reporter.threshold * 1000:.0f} мс (всего / количество / максимум):")
+    for name, count, total, longest in slow:
+        print(f"  {total:>8.2f} с  {count:>6}  {longest * 1000:>8.0f} мс  {name}")
+
+async def run_profiled(coro: Awaitable, output: Optional[str] = None,
+                       slow_threshold: float = 0.1, lag_interval: float = 0.1):
+    monitor = LoopLagMonitor(interval=lag_interval, stall_threshold=slow_threshold)
+    reporter = SlowCallbackReporter(threshold=slow_threshold)
+    sampler = SamplingProfiler(output) if output else None
+
+    started = time.perf_counter()
+    monitor.start()
+    reporter.start()
+    if sampler:
+        sampler.start()
+    try:
+        return await coro
+    finally:
+        monitor.stop()
+        reporter.stop()
+        if sampler:
+            sampler.stop()
+        print_profile_report(monitor, reporter, time.perf_counter() - started)
@@ -8,9 +8,11 @@ logger = logging.getLogger(__name__)
 
 class AsyncRobotsParser:
     _cache = {}  # Кеш для правил robots.txt
+    _sitemap_cache = {}  # Кеш директив Sitemap из robots.txt
     
     def __init__(self):
         self.rules = {}
+        self.sitemaps = []
         self.domain = None
 
     @classmethod
@@ -24,6 +26,7 @@ class AsyncRobotsParser:
         if domain in self._cache:
             logger.debug(f"Использование кеша для {domain}")
             self.rules = self._cache[domain]
+            self.sitemaps = self._sitemap_cache.get(domain, [])
             return
         
         robots_url = f"https://{domain}/robots.txt"
@@ -41,6 +44,7 @@ class AsyncRobotsParser:
                     logger.info(f"Успешно загружен robots.txt для {domain}")
                 
                 self._cache[domain] = self.rules
+                self._sitemap_cache[domain] = self.sitemaps
 
         except aiohttp.ClientError as e:
             logger.error(f"Сетевая ошибка при загрузке {robots_url}: {str(e)}")
@@ -74,6 +78,10 @@ class AsyncRobotsParser:
                     current_agent = value.lower() if value else '*'
                     if current_agent not in rules:
                         rules[current_agent] = {'allow': [], 'disallow': []}
+                elif key == 'sitemap':
+                    # Sitemap не зависит от User-Agent и относится ко всему файлу
+                    if value and value not in self.sitemaps:
+                        self.sitemaps.append(value)
                 elif key in ('allow', 'disallow'):
                     path = value.strip()
                     if not path.startswith('/'):
@@ -134,4 +142,12 @@ async def check_robots_txt_async(
         return robots_parser.can_fetch(user_agent, parsed_url.path)
     except Exception as e:
         logger.error(f"Критическая ошибка проверки robots.txt для {url}: {str(e)}")
-        return False  # Запрещаем доступ при любых ошибках
\ No newline at end of file
+        return False  # Запрещаем доступ при любых ошибках
+
+async def get_sitemaps_async(domain: str, session: aiohttp.ClientSession) -> list:
+    try:
+        robots_parser = await AsyncRobotsParser.create(domain, session)
+        return list(robots_parser.sitemaps)
+    except Exception as e:
+        logger.error(f"Ошибка получения списка sitemap для {domain}: {str(e)}")
+        return []
@@ -0,0 +1,130 @@
+# utils/sitemap_loader.py
+from collections import deque
+from datetime import datetime
+from typing import AsyncIterator, Iterable, Optional, Tuple
+import xml.etree.ElementTree as ET
+import logging
+import zlib
+import aiohttp
+import asyncio
+
+logger = logging.getLogger(__name__)
+
+GZIP_MAGIC = b'\x1f\x8b'
+CHUNK_SIZE = 64 * 1024
+
+# Учитываются только элементы протокола sitemap: image:loc, video:loc и другие расширения
+# имеют те же локальные имена, но другое пространство имен
+SITEMAP_NS = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+ENTRY_TAGS = {f'{SITEMAP_NS}url': 'url', f'{SITEMAP_NS}sitemap': 'sitemap'}
+LOC_TAG = f'{SITEMAP_NS}loc'
+LASTMOD_TAG = f'{SITEMAP_NS}lastmod'
+
+def parse_lastmod(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    except ValueError:
+        logger.debug(f"Некорректное значение lastmod: {value}")
+        return None
+
+class _SitemapHandler:
+    def __init__(self):
+        self.parser = ET.XMLPullParser(events=('start', 'end'))
+        self.root = None
+        # Путь от корня до текущего элемента: loc принимается только как прямой потомок url/sitemap
+        self.path = []
+        self.loc = None
+        self.lastmod = None
+        self.nested = []
+
+    def feed(self, data: bytes):
+        self.parser.feed(data)
+        return self._drain()
+
+    def close(self):
+        self.parser.close()
+        return self._drain()
+
+    def _drain(self):
+        found = []
+        for event, element in self.parser.read_events():
+            if event == 'start':
+                if self.root is None:
+                    self.root = element
+                self.path.append(element.tag)
+                continue
+
+            self.path.pop()
+            tag = element.tag
+            parent = self.path[-1] if self.path else None
+            if parent in ENTRY_TAGS and len(self.path) == 2:
+                if tag == LOC_TAG:
+                    self.loc = (element.text or '').strip()
+                elif tag == LASTMOD_TAG:
+                    self.lastmod = parse_lastmod(element.text)
+            elif tag in ENTRY_TAGS and len(self.path) == 1:
+                if self.loc:
+                    # Индекс sitemap: вложенные файлы обрабатываются следующими
+                    (found if ENTRY_TAGS[tag] == 'url' else self.nested).append((self.loc, self.lastmod))
+                self.loc, self.lastmod = None, None
+                # Разобранные записи удаляются из корня, чтобы не копить дерево в памяти
+                self.root.clear()
+        return found
+
+async def iter_sitemap_urls(
+    sitemap_urls: Iterable[str],
+    session: aiohttp.ClientSession,
+    max_sitemaps: int = 50,
+    timeout: float = 30
+) -> AsyncIterator[Tuple[str, Optional[datetime]]]:
+    queue = deque(sitemap_urls)
+    seen = set()
+    processed = 0
+
+    while queue and processed < max_sitemaps:
+        sitemap_url = queue.popleft()
+        if sitemap_url in seen:
+            continue
+        seen.add(sitemap_url)
+        processed += 1
+
+        try:
+            async with session.get(sitemap_url, timeout=timeout) as response:
+                if response.status != 200:
+                    logger.warning(f"Sitemap {sitemap_url} недоступен: {response.status}")
+                    continue
+
+                # Потоковый разбор: документ не загружается в память целиком
+                handler = _SitemapHandler()
+                decompressor = None
+                first_chunk = True
+                urls = 0
+
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    if first_chunk:
+                        # .xml.gz обычно отдается как файл, без Content-Encoding
+                        if chunk.startswith(GZIP_MAGIC):
+                            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                        first_chunk = False
+                    for item in handler.feed(decompressor.decompress(chunk) if decompressor else chunk):
+                        urls += 1
+                        yield item
+
+                tail = handler.feed(decompressor.flush()) if decompressor else []
+                for item in tail + handler.close():
+                    urls += 1
+                    yield item
+
+                queue.extend(loc for loc, _ in handler.nested if loc not in seen)
+                logger.info(f"Обработан sitemap {sitemap_url}: {urls} URL, вложенных: {len(handler.nested)}")
+
+        except ET.ParseError as e:
+            logger.warning(f"Ошибка разбора sitemap {sitemap_url}: {str(e)}")
+        except zlib.error as e:
+            logger.warning(f"Ошибка распаковки sitemap {sitemap_url}: {str(e)}")
+        except aiohttp.ClientError as e:
+            logger.error(f"Клиентская ошибка при загрузке sitemap {sitemap_url}: {str(e)}")
+        except asyncio.TimeoutError:
+            logger.error(f"Таймаут при загрузке sitemap {sitemap_url}")
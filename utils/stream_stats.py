@@ -0,0 +1,296 @@
+# utils/stream_stats.py
+from datetime import datetime, date
+from typing import Dict, Optional, Tuple
+import json
+import logging
+import math
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+METRICS = ("views", "comments", "forwards")
+AGGREGATES_VERSION = 2
+
+class QuantileSketch:
+    # Логарифмические корзины (как в DDSketch): относительная ошибка квантиля <= alpha,
+    # объем памяти зависит от диапазона значений, а не от их количества
+    def __init__(self, alpha: float = 0.01):
+        self.alpha = alpha
+        self._gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self._gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value: float, count: int = 1):
+        self.count += count
+        if value <= 0:
+            self.zero_count += count
+            return
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def remove(self, value: float) -> bool:
+        # Счетчики корзин точные, поэтому значение можно исключить без потери точности
+        if value <= 0:
+            if not self.zero_count:
+                return False
+            self.zero_count -= 1
+        else:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            count = self.buckets.get(index, 0)
+            if not count:
+                return False
+            if count == 1:
+                del self.buckets[index]
+            else:
+                self.buckets[index] = count - 1
+        self.count -= 1
+        return True
+
+    def merge(self, other: "QuantileSketch"):
+        if other.alpha != self.alpha:
+            raise ValueError("Нельзя объединить скетчи с разной точностью")
+        self.count += other.count
+        self.zero_count += other.zero_count
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+        seen = self.zero_count
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                return 2 * self._gamma ** index / (self._gamma + 1)
+        return 2 * self._gamma ** max(self.buckets) / (self._gamma + 1)
+
+    def to_dict(self) -> dict:
+        return {"alpha": self.alpha, "zero_count": self.zero_count,
+                "buckets": {str(index): count for index, count in self.buckets.items()}}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "QuantileSketch":
+        sketch = cls(data["alpha"])
+        sketch.zero_count = data["zero_count"]
+        sketch.buckets = {int(index): count for index, count in data["buckets"].items()}
+        sketch.count = sketch.zero_count + sum(sketch.buckets.values())
+        return sketch
+
+class MetricStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        self.sketch = QuantileSketch()
+
+    def add(self, value: int):
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self.sketch.add(value)
+
+    def replace(self, old: int, new: int):
+        # Обновленный счетчик публикации: старое значение заменяется новым. Минимум и максимум
+        # не пересчитываются назад - для растущих счетчиков максимум остается точным
+        if not self.sketch.remove(old):
+            return
+        self.total += new - old
+        self.sketch.add(new)
+        self.min = new if self.min is None else min(self.min, new)
+        self.max = new if self.max is None else max(self.max, new)
+
+    def merge(self, other: "MetricStats"):
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0
+
+    def to_dict(self) -> dict:
+        return {"count": self.count, "total": self.total, "min": self.min, "max": self.max,
+                "sketch": self.sketch.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "MetricStats":
+        stats = cls()
+        stats.count, stats.total = data["count"], data["total"]
+        stats.min, stats.max = data["min"], data["max"]
+        stats.sketch = QuantileSketch.from_dict(data["sketch"])
+        return stats
+
+class GroupStats:
+    def __init__(self):
+        self.posts = 0
+        self.date_min: Optional[datetime] = None
+        self.date_max: Optional[datetime] = None
+        self.metrics = {name: MetricStats() for name in METRICS}
+
+    def add(self, posted_at: datetime, views: int, comments: int, forwards: int):
+        self.posts += 1
+        self.date_min = posted_at if self.date_min is None else min(self.date_min, posted_at)
+        self.date_max = posted_at if self.date_max is None else max(self.date_max, posted_at)
+        self.metrics["views"].add(views)
+        self.metrics["comments"].add(comments)
+        self.metrics["forwards"].add(forwards)
+
+    def replace(self, old: Tuple[int, int, int], new: Tuple[int, int, int]):
+        for name, old_value, new_value in zip(METRICS, old, new):
+            if old_value != new_value:
+                self.metrics[name].replace(old_value, new_value)
+
+    def merge(self, other: "GroupStats"):
+        self.posts += other.posts
+        for attr, pick in (("date_min", min), ("date_max", max)):
+            theirs = getattr(other, attr)
+            if theirs is not None:
+                ours = getattr(self, attr)
+                setattr(self, attr, theirs if ours is None else pick(ours, theirs))
+        for name in METRICS:
+            self.metrics[name].merge(other.metrics[name])
+
+    def summary(self) -> dict:
+        return {
+            "posts": self.posts,
+            **{name: {"mean": stats.mean, "median": stats.sketch.quantile(0.5),
+                      "p95": stats.sketch.quantile(0.95), "max": stats.max}
+               for name, stats in self.metrics.items()}
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "posts": self.posts,
+            "date_min": self.date_min.isoformat() if self.date_min else None,
+            "date_max": self.date_max.isoformat() if self.date_max else None,
+            "metrics": {name: stats.to_dict() for name, stats in self.metrics.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "GroupStats":
+        group = cls()
+        group.posts = data["posts"]
+        group.date_min = datetime.fromisoformat(data["date_min"]) if data["date_min"] else None
+        group.date_max = datetime.fromisoformat(data["date_max"]) if data["date_max"] else None
+        group.metrics = {name: MetricStats.from_dict(stats) for name, stats in data["metrics"].items()}
+        return group
+
+class TelegramAggregates:
+    def __init__(self):
+        self.total = GroupStats()
+        self.by_university: Dict[str, GroupStats] = {}
+        # Каналы различаются по id: названия меняются и могут совпадать у разных каналов
+        self.by_channel: Dict[int, GroupStats] = {}
+        self.by_day: Dict[Tuple[str, date], GroupStats] = {}
+
+    @staticmethod
+    def _group(groups: dict, key) -> GroupStats:
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = GroupStats()
+        return group
+
+    def update(self, university: str, channel_id: int, posted_at: datetime,
+               views: int, comments: int, forwards: int):
+        values = (posted_at, views, comments, forwards)
+        self.total.add(*values)
+        self._group(self.by_university, university).add(*values)
+        self._group(self.by_channel, channel_id).add(*values)
+        self._group(self.by_day, (university, posted_at.date())).add(*values)
+
+    def revise(self, university: str, channel_id: int, posted_at: datetime,
+               old: Tuple[int, int, int], new: Tuple[int, int, int]):
+        # Счетчики (views, comments, forwards) публикации, учтенной ранее, обновлены повторным запросом
+        groups = [self.total, self.by_university.get(university), self.by_channel.get(channel_id),
+                  self.by_day.get((university, posted_at.date()))]
+        for group in groups:
+            if group is not None:
+                group.replace(old, new)
+
+    def merge(self, other: "TelegramAggregates"):
+        self.total.merge(other.total)
+        for ours, theirs in ((self.by_university, other.by_university),
+                             (self.by_channel, other.by_channel),
+                             (self.by_day, other.by_day)):
+            for key, group in theirs.items():
+                self._group(ours, key).merge(group)
+
+    def daily_counts(self) -> Dict[Tuple[str, date], int]:
+        return {key: group.posts for key, group in self.by_day.items()}
+
+    def summary(self) -> dict:
+        total = self.total
+        return {
+            "total_posts": total.posts,
+            "channels": len(self.by_channel),
+            "views": total.metrics["views"].mean,
+            "comments": total.metrics["comments"].mean,
+            "forwards": total.metrics["forwards"].mean,
+            "date_range": (total.date_min.strftime('%Y-%m-%d'),
+                           total.date_max.strftime('%Y-%m-%d')) if total.posts else None,
+            "universities": {name: group.summary() for name, group in self.by_university.items()}
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "version": AGGREGATES_VERSION,
+            "total": self.total.to_dict(),
+            "by_university": {key: group.to_dict() for key, group in self.by_university.items()},
+            "by_channel": {key: group.to_dict() for key, group in self.by_channel.items()},
+            "by_day": [[university, day.isoformat(), group.to_dict()]
+                       for (university, day), group in self.by_day.items()]
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TelegramAggregates":
+        aggregates = cls()
+        aggregates.total = GroupStats.from_dict(data["total"])
+        aggregates.by_university = {key: GroupStats.from_dict(group)
+                                    for key, group in data["by_university"].items()}
+        if data.get("version", 1) >= 2:
+            aggregates.by_channel = {int(key): GroupStats.from_dict(group)
+                                     for key, group in data["by_channel"].items()}
+        elif data["by_channel"]:
+            # В первой версии каналы хранились по названию, сопоставить их с id нельзя
+            logger.warning("Агрегаты по каналам сохранены в старом формате (по названиям) и будут "
+                           "накапливаться заново")
+        aggregates.by_day = {(university, date.fromisoformat(day)): GroupStats.from_dict(group)
+                             for university, day, group in data["by_day"]}
+        return aggregates
+
+    def save(self, path: str):
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, mode='w', encoding='utf-8') as file:
+                json.dump(self.to_dict(), file, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"Ошибка сохранения агрегатов {path}: {str(e)}")
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> "TelegramAggregates":
+        if not os.path.exists(path):
+            return cls()
+        try:
+            with open(path, encoding='utf-8') as file:
+                return cls.from_dict(json.load(file))
+        except Exception as e:
+            # Поврежденный файл не перезаписывается пустыми агрегатами, а откладывается в сторону
+            corrupt_path = f"{path}.{time.strftime('%Y%m%d%H%M%S')}.corrupt"
+            os.replace(path, corrupt_path)
+            logger.error(f"Ошибка чтения агрегатов {path}: {str(e)}. Файл перемещен в {corrupt_path}, "
+                         f"накопленная статистика начинается заново")
+            return cls()
@@ -0,0 +1,89 @@
+# utils/sync_state.py
+from typing import Dict, Any, Tuple
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+class SyncState:
+    def __init__(self, path: str = "data/telegram_sync_state.json"):
+        self.path = path
+        self.channels: Dict[str, Dict[str, Any]] = {}
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                self.channels = json.load(file).get("channels", {})
+            logger.info(f"Загружено состояние синхронизации для {len(self.channels)} каналов")
+        except Exception as e:
+            logger.error(f"Ошибка чтения состояния синхронизации {self.path}: {str(e)}")
+            self.channels = {}
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            # Запись через временный файл, чтобы не повредить состояние при сбое
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, mode='w', encoding='utf-8') as file:
+                json.dump({"channels": self.channels}, file, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Ошибка сохранения состояния синхронизации {self.path}: {str(e)}")
+            raise
+
+    # Состояние канала: все сообщения с id <= last_id уже загружены. Если при прошлом
+    # запуске история была обрезана лимитом, в pending хранится незавершенный диапазон:
+    # загружены id от resume_id до high_id, а промежуток (last_id, resume_id) - еще нет
+
+    def resume_point(self, channel_id: int) -> Tuple[int, int, bool]:
+        # Возвращает offset_id, min_id и признак догрузки пропуска
+        entry = self.channels.get(str(channel_id), {})
+        pending = entry.get("pending")
+        if pending:
+            return pending["resume_id"], entry.get("last_id", 0), True
+        return 0, entry.get("last_id", 0), False
+
+    def is_stored(self, channel_id: int, message_id: int) -> bool:
+        entry = self.channels.get(str(channel_id))
+        if not entry:
+            return False
+        if message_id <= entry.get("last_id", 0):
+            return True
+        pending = entry.get("pending")
+        return bool(pending) and pending["resume_id"] <= message_id <= pending["high_id"]
+
+    def record_pass(self, channel_id: int, newest, oldest, complete: bool, gap: bool,
+                    title: str = None):
+        # newest/oldest - первое и последнее сообщение прохода (история идет от новых к старым),
+        # complete - проход дошел до min_id или границы периода, а не до лимита сообщений
+        entry = self.channels.setdefault(str(channel_id), {"last_id": 0, "last_date": None})
+        if title:
+            entry["title"] = title
+        pending = entry.get("pending")
+
+        if gap:
+            if complete:
+                entry["last_id"] = pending["high_id"]
+                entry["last_date"] = pending["high_date"]
+                del entry["pending"]
+            elif oldest is not None:
+                pending["resume_id"] = oldest.id
+            return
+
+        if newest is None:
+            return
+        if complete:
+            # Проход без пропусков от newest до min_id: отметку можно сдвигать
+            high_id, high_date = newest.id, newest.date.isoformat()
+            if pending and pending["high_id"] > high_id:
+                high_id, high_date = pending["high_id"], pending["high_date"]
+            if high_id > entry["last_id"]:
+                entry["last_id"], entry["last_date"] = high_id, high_date
+            entry.pop("pending", None)
+        elif not pending and newest.id > entry["last_id"]:
+            entry["pending"] = {"high_id": newest.id, "high_date": newest.date.isoformat(),
+                                "resume_id": oldest.id}
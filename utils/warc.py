@@ -0,0 +1,189 @@
+# utils/warc.py
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import glob
+import logging
+import mmap
+import os
+import re
+import uuid
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# Запись индекса: смещение и длина gzip-члена в файле, HTTP-статус, URL
+IndexEntry = Tuple[int, int, int, str]
+
+# Файлы одного обхода: <prefix>-<время начала>-<номер>.warc.gz, идентификатор обхода - <prefix>-<время>
+_WARC_NAME = re.compile(r'^(?P<crawl>.+-(?P<started>\d{14}))-\d{5}\.warc\.gz$')
+
+# Тело сохраняется уже распакованным и без chunked-кодирования, поэтому заголовки, описывающие
+# передачу, переименовываются (X-Archive-Orig-*), а Content-Length пересчитывается по телу
+_TRANSFER_HEADERS = {b"content-encoding", b"transfer-encoding", b"content-length"}
+
+def _stored_headers(headers: Iterable[Tuple[bytes, bytes]], body_length: int) -> List[Tuple[bytes, bytes]]:
+    stored = []
+    for name, value in headers:
+        if name.lower() in _TRANSFER_HEADERS:
+            name = b"X-Archive-Orig-" + name
+        stored.append((name, value))
+    stored.append((b"Content-Length", str(body_length).encode('ascii')))
+    return stored
+
+def _gzip_member(data: bytes) -> bytes:
+    # Каждая запись сжимается отдельным gzip-членом: файл остается корректным .warc.gz,
+    # а любую запись можно распаковать по смещению без чтения предыдущих
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+class WarcWriter:
+    def __init__(self, directory: str, prefix: str = "crawl", max_file_size: int = 1024 * 1024 * 1024):
+        if max_file_size <= 0:
+            raise ValueError("Максимальный размер WARC-файла должен быть > 0")
+        self.directory = directory
+        self.prefix = prefix
+        self.max_file_size = max_file_size
+        self.records = 0
+        self._file = None
+        self._index = None
+        self._sequence = 0
+        self._started = datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')
+
+    def _rotate(self):
+        self.close()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{self.prefix}-{self._started}-{self._sequence:05d}.warc.gz")
+        self._sequence += 1
+        self._file = open(path, 'wb')
+        self._index = open(f"{path}.idx", 'w', encoding='utf-8')
+        logger.info(f"Запись WARC в {path}")
+
+    def write_response(self, url: str, status: int, reason: Optional[str],
+                       headers: Iterable[Tuple[bytes, bytes]], body: bytes, truncated: Optional[str] = None):
+        # body - декодированное тело ответа; truncated - причина, если тело сохранено не полностью
+        http_head = f"HTTP/1.1 {status} {reason or ''}\r\n".encode('latin-1', errors='replace')
+        http_head += b"".join(name + b": " + value + b"\r\n"
+                              for name, value in _stored_headers(headers, len(body))) + b"\r\n"
+        block_length = len(http_head) + len(body)
+        warc_head = (
+            "WARC/1.0\r\n"
+            "WARC-Type: response\r\n"
+            f"WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>\r\n"
+            f"WARC-Date: {datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}\r\n"
+            f"WARC-Target-URI: {url}\r\n"
+            + (f"WARC-Truncated: {truncated}\r\n" if truncated else "") +
+            "Content-Type: application/http; msgtype=response\r\n"
+            f"Content-Length: {block_length}\r\n\r\n"
+        ).encode('utf-8')
+        member = _gzip_member(warc_head + http_head + body + b"\r\n\r\n")
+
+        if self._file is None or self._file.tell() + len(member) > self.max_file_size:
+            self._rotate()
+        offset = self._file.tell()
+        self._file.write(member)
+        self._index.write(f"{offset}\t{len(member)}\t{status}\t{url}\n")
+        self.records += 1
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._index.close()
+            self._file = self._index = None
+
+def list_warc_files(directory: str) -> List[str]:
+    return sorted(glob.glob(os.path.join(directory, "*.warc.gz")))
+
+def _crawl_key(path: str) -> Tuple[str, str]:
+    match = _WARC_NAME.match(os.path.basename(path))
+    return (match.group('started'), match.group('crawl')) if match else ("", "")
+
+def select_crawl_files(directory: str, crawl: Optional[str] = None) -> List[str]:
+    # По умолчанию выбирается последний обход в папке; "all" - все файлы от новых к старым,
+    # чтобы при повторе URL учитывалась последняя версия страницы
+    files = list_warc_files(directory)
+    crawls: Dict[str, List[str]] = {}
+    for path in files:
+        crawls.setdefault(_crawl_key(path)[1], []).append(path)
+    if crawl == "all":
+        return sorted(files, key=_crawl_key, reverse=True)
+    if crawl:
+        if crawl not in crawls:
+            available = ', '.join(sorted(name for name in crawls if name))
+            raise ValueError(f"Обход {crawl} не найден в {directory}, доступны: {available}")
+        return crawls[crawl]
+    named = [path for path in files if _crawl_key(path)[1]]
+    if not named:
+        return files
+    return crawls[max(_crawl_key(path) for path in named)[1]]
+
+def scan_index(path: str, chunk_size: int = 1024 * 1024) -> List[IndexEntry]:
+    # Построение индекса для WARC без .idx: границы gzip-членов находятся распаковкой
+    entries = []
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        offset = 0
+        while offset < len(data):
+            decompressor = zlib.decompressobj(31)
+            position = offset
+            head = b""
+            while not decompressor.eof and position < len(data):
+                chunk = data[position:position + chunk_size]
+                position += len(chunk)
+                out = decompressor.decompress(chunk)
+                if len(head) < 65536:
+                    head += out[:65536]
+            length = position - offset - len(decompressor.unused_data)
+            record = parse_record(head)
+            if record and record[0] == "response":
+                entries.append((offset, length, record[2], record[1]))
+            offset += length
+    return entries
+
+def read_index(path: str) -> List[IndexEntry]:
+    index_path = f"{path}.idx"
+    if not os.path.exists(index_path):
+        logger.info(f"Индекс {index_path} не найден, сканирование {path}")
+        return scan_index(path)
+    entries = []
+    with open(index_path, encoding='utf-8') as file:
+        for line in file:
+            offset, length, status, url = line.rstrip('\n').split('\t', 3)
+            entries.append((int(offset), int(length), int(status), url))
+    return entries
+
+def parse_record(raw: bytes) -> Optional[Tuple[str, str, int, dict, bytes]]:
+    # Возвращает тип записи, URL, HTTP-статус, HTTP-заголовки и тело ответа
+    warc_head, _, block = raw.partition(b"\r\n\r\n")
+    fields = {}
+    for line in warc_head.split(b"\r\n")[1:]:
+        name, _, value = line.decode('utf-8', errors='replace').partition(':')
+        fields[name.strip().lower()] = value.strip()
+    record_type = fields.get("warc-type", "")
+    url = fields.get("warc-target-uri", "")
+    if record_type != "response":
+        return (record_type, url, 0, {}, b"") if record_type else None
+
+    http_head, _, body = block.partition(b"\r\n\r\n")
+    lines = http_head.decode('latin-1').split("\r\n")
+    try:
+        status = int(lines[0].split(" ", 2)[1])
+    except (IndexError, ValueError):
+        status = 0
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if body.endswith(b"\r\n\r\n"):
+        body = body[:-4]
+    return record_type, url, status, headers, body
+
+def iter_records(path: str, entries: List[IndexEntry]) -> Iterator[Tuple[str, int, dict, bytes]]:
+    # Файл отображается в память: читаются только нужные gzip-члены
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        for offset, length, _, _ in entries:
+            try:
+                record = parse_record(zlib.decompress(data[offset:offset + length], 31))
+            except zlib.error as e:
+                logger.warning(f"Поврежденная запись WARC в {path} по смещению {offset}: {str(e)}")
+                continue
+            if record and record[0] == "response":
+                yield record[1:]